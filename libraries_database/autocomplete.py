@@ -0,0 +1,219 @@
+"""
+In-process prefix indexes behind GET /api/v1/autocomplete/.
+
+A search box asks for suggestions on every keystroke, so answers come from
+memory instead of a ``LIKE`` over joined tables. Each kind (book titles,
+author names, category names) has a sorted array of normalized keys,
+searched with ``bisect``. Author and category keys are stored once per word,
+so "dost" finds "Fyodor Dostoevsky".
+
+An index is loaded on its first lookup. After that, the model signals in
+signals.py keep it current as writes commit in this process. Writes made by
+other workers are picked up when the index is older than
+``AUTOCOMPLETE_MAX_AGE`` seconds: it is then rebuilt in a background thread
+while the old one keeps answering. Each index holds at most
+``AUTOCOMPLETE_MAX_ENTRIES`` objects, at roughly 150-200 bytes each.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Author, Book, Category
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 50
+_SEPARATOR = '\x00'
+
+
+class PrefixIndex:
+    """
+    Sorted ``normalized-text NUL id`` keys plus the display label of every id.
+
+    With ``word_starts`` every word of a label starts a key of its own, so a
+    prefix can match any word, not only the first one.
+    """
+
+    def __init__(self, word_starts=False, max_entries=None):
+        self.word_starts = word_starts
+        self.max_entries = max_entries
+        self.keys = []
+        self.labels = {}
+        self.truncated = False
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _keys(self, pk, label):
+        words = tokenize(label)
+        starts = range(len(words)) if self.word_starts else range(min(1, len(words)))
+        return [f"{' '.join(words[start:])}{_SEPARATOR}{pk}" for start in starts]
+
+    def _full(self):
+        if self.max_entries is not None and len(self.labels) >= self.max_entries:
+            self.truncated = True
+            return True
+        return False
+
+    def load(self, rows):
+        """Fill from ``(pk, label)`` rows with one sort at the end."""
+        for pk, label in rows:
+            if self._full():
+                break
+            self.labels[pk] = label
+            self.keys.extend(self._keys(pk, label))
+        self.keys.sort()
+        return self
+
+    def put(self, pk, label):
+        self.remove(pk)
+        if self._full():
+            return
+        self.labels[pk] = label
+        for key in self._keys(pk, label):
+            insort(self.keys, key)
+
+    def remove(self, pk):
+        label = self.labels.pop(pk, None)
+        if label is None:
+            return
+        for key in self._keys(pk, label):
+            position = bisect_left(self.keys, key)
+            if position < len(self.keys) and self.keys[position] == key:
+                del self.keys[position]
+
+    def lookup(self, prefix, limit=10):
+        """Up to ``limit`` ``{'id', 'value'}`` matches of ``prefix``, in key order."""
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+        results, seen = [], set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(results) < limit:
+            key = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            pk = int(key[key.rindex(_SEPARATOR) + 1:])
+            if pk not in seen:
+                seen.add(pk)
+                results.append({'id': pk, 'value': self.labels[pk]})
+            position += 1
+        return results
+
+
+def _title_rows(limit):
+    return Book.objects.order_by('pk').values_list('pk', 'title')[:limit].iterator(chunk_size=10000)
+
+
+def _author_rows(limit):
+    rows = Author.objects.order_by('pk').values_list('pk', 'first_name', 'last_name')[:limit]
+    return ((pk, f"{first_name} {last_name}") for pk, first_name, last_name in rows.iterator(chunk_size=10000))
+
+
+def _category_rows(limit):
+    return Category.objects.order_by('pk').values_list('pk', 'category')[:limit].iterator(chunk_size=10000)
+
+
+# kind -> (row loader, index every word)
+KINDS = {
+    'title': (_title_rows, False),
+    'author': (_author_rows, True),
+    'category': (_category_rows, True),
+}
+
+_lock = threading.Lock()
+_indexes = {}
+_built_at = {}
+# Kinds being rebuilt in the background, with the writes seen meanwhile.
+_refreshing = {}
+
+
+def _max_entries():
+    return getattr(settings, 'AUTOCOMPLETE_MAX_ENTRIES', 1000000)
+
+
+def _max_age():
+    return getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 600)
+
+
+def _build(kind):
+    loader, word_starts = KINDS[kind]
+    limit = _max_entries()
+    index = PrefixIndex(word_starts=word_starts, max_entries=limit).load(loader(limit + 1))
+    if index.truncated:
+        logger.warning("Autocomplete %s index is capped at %d entries.", kind, limit)
+    return index
+
+
+def _refresh(kind):
+    try:
+        index = _build(kind)
+    except Exception:
+        logger.exception("Rebuilding the autocomplete %s index failed.", kind)
+        with _lock:
+            _refreshing.pop(kind, None)
+        return
+    finally:
+        connection.close()
+    with _lock:
+        # Replay writes committed while the new index was being read.
+        for change in _refreshing.pop(kind, []):
+            _apply(index, *change)
+        _indexes[kind] = index
+        _built_at[kind] = time.monotonic()
+
+
+def _get(kind):
+    with _lock:
+        index = _indexes.get(kind)
+        if index is not None:
+            if time.monotonic() - _built_at[kind] > _max_age() and kind not in _refreshing:
+                _refreshing[kind] = []
+                threading.Thread(target=_refresh, args=(kind,), daemon=True).start()
+            return index
+    index = _build(kind)
+    with _lock:
+        # Another request may have finished building first; keep that one.
+        if kind not in _indexes:
+            _indexes[kind] = index
+            _built_at[kind] = time.monotonic()
+        return _indexes[kind]
+
+
+def lookup(kind, prefix, limit=10):
+    index = _get(kind)
+    with _lock:
+        return index.lookup(prefix, min(limit, MAX_LIMIT))
+
+
+def _apply(index, pk, label):
+    if label is None:
+        index.remove(pk)
+    else:
+        index.put(pk, label)
+
+
+def _change(kind, pk, label):
+    with _lock:
+        index = _indexes.get(kind)
+        if index is not None:
+            _apply(index, pk, label)
+        if kind in _refreshing:
+            _refreshing[kind].append((pk, label))
+
+
+def update(kind, pk, label):
+    """Set (or with ``label=None`` drop) ``pk`` in an index once the current transaction commits."""
+    transaction.on_commit(lambda: _change(kind, pk, label))
+
+
+def clear():
+    """Drop every index; each is loaded again on its next lookup."""
+    with _lock:
+        _indexes.clear()
+        _built_at.clear()
@@ -0,0 +1,87 @@
+"""
+In-process cache of book availability for the batch lookup endpoint.
+
+Search result pages ask for the copy counts of dozens of books at once, and
+most of those books never change between two searches. Each worker keeps a
+small LRU of ``book_id -> (available_copies, total_copies)``. The borrow and
+return paths in circulation.py and the Book signals evict the books they
+touch. Other workers only see an eviction when their entry expires, so
+entries also carry a short TTL (``AVAILABILITY_CACHE_TTL`` seconds).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Book
+
+MAX_IDS = 500
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+
+
+def _max_size():
+    return getattr(settings, 'AVAILABILITY_CACHE_SIZE', 10000)
+
+
+def _ttl():
+    return getattr(settings, 'AVAILABILITY_CACHE_TTL', 5)
+
+
+def get_many(book_ids):
+    """
+    ``{book_id: (available_copies, total_copies)}`` for the ids that exist.
+
+    Cached entries are served from memory; the rest are loaded with one query.
+    """
+    now = time.monotonic()
+    found, missing = {}, []
+    with _lock:
+        for book_id in book_ids:
+            entry = _entries.get(book_id)
+            if entry is not None and entry[1] > now:
+                _entries.move_to_end(book_id)
+                found[book_id] = entry[0]
+            else:
+                missing.append(book_id)
+    if not missing:
+        return found
+
+    rows = Book.objects.filter(pk__in=missing).values_list('pk', 'available_copies', 'total_copies')
+    loaded = {pk: (available, total) for pk, available, total in rows}
+    found.update(loaded)
+    expires = time.monotonic() + _ttl()
+    with _lock:
+        for book_id, counts in loaded.items():
+            _entries[book_id] = (counts, expires)
+            _entries.move_to_end(book_id)
+        while len(_entries) > _max_size():
+            _entries.popitem(last=False)
+    return found
+
+
+def _evict(book_ids):
+    with _lock:
+        for book_id in book_ids:
+            _entries.pop(book_id, None)
+
+
+def invalidate(book_ids):
+    """
+    Drop the cached counts of ``book_ids``.
+
+    Like ``caching.bump_version`` this runs now and again on commit, so a
+    concurrent reader cannot re-cache the pre-commit counts.
+    """
+    book_ids = list(book_ids)
+    _evict(book_ids)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _evict(book_ids))
+
+
+def clear():
+    with _lock:
+        _entries.clear()
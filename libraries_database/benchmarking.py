@@ -0,0 +1,64 @@
+"""
+Shared helpers for the ``benchmark_*`` management commands.
+"""
+import math
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database(use_existing=False):
+    """
+    Run a benchmark inside a throwaway test database, like the test runner does.
+
+    With ``use_existing`` the configured database is used as-is, which is how
+    benchmarks are pointed at a production-sized copy.
+    """
+    setup_test_environment()
+    old_name = None
+    try:
+        if not use_existing:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        yield
+    finally:
+        if old_name is not None:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms):
+    """Latency summary in milliseconds for a list of samples."""
+    if not samples_ms:
+        return {'count': 0}
+    return {
+        'count': len(samples_ms),
+        'mean_ms': round(statistics.fmean(samples_ms), 3),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3),
+    }
+
+
+@contextmanager
+def timed(samples_ms):
+    """Append the elapsed wall time of the block, in milliseconds, to ``samples_ms``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples_ms.append((time.perf_counter() - start) * 1000)
@@ -0,0 +1,143 @@
+"""
+Versioned response cache for the read-heavy catalog viewsets.
+
+Every model has a version number in the cache. Any write bumps it, through
+the model signals in signals.py or explicitly from the queryset-update paths.
+A cached response's key covers the versions of every model it was built
+from, so a write makes old entries unreachable instead of having to find and
+delete them. The backend is whatever ``RESPONSE_CACHE_ALIAS`` names in
+``CACHES``: local memory by default, or a shared backend such as Redis or
+Memcached when several processes should share hits.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import conditional
+
+KEY_PREFIX = 'libcache'
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(model):
+    return f"{KEY_PREFIX}:version:{model._meta.label_lower}"
+
+
+def get_versions(models):
+    """Current version of each model, seeding missing ones so they never go backwards."""
+    cache = get_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def bump_version(*models):
+    """
+    Invalidate every cached response built from ``models``.
+
+    The bump happens immediately and again when the surrounding transaction
+    commits, so a reader cannot re-cache pre-commit data under the new version.
+    """
+    keys = [_version_key(model) for model in models]
+    _bump(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def record(name, hit):
+    with _stats_lock:
+        _stats[name]['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    """Per-viewset hit/miss counts for this process."""
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class CachedResponseMixin:
+    """
+    Cache successful list/retrieve responses of a viewset.
+
+    ``cache_dependencies`` lists every model the serialized output depends on;
+    a write to any of them invalidates the cached responses.
+    """
+    cache_dependencies = ()
+    cached_actions = ('list', 'retrieve')
+
+    def get_cache_dependencies(self):
+        return self.cache_dependencies or (self.get_queryset().model,)
+
+    def get_cache_query(self, request):
+        # Parameter order is irrelevant to the filters, so sort it away.
+        return sorted((key, tuple(values)) for key, values in request.query_params.lists())
+
+    def get_response_cache_key(self, request):
+        # The host is part of the key because pagination links are absolute.
+        raw = repr((
+            self.basename,
+            self.action,
+            request.build_absolute_uri(request.path),
+            request.accepted_renderer.format,
+            self.get_cache_query(request),
+            get_versions(self.get_cache_dependencies()),
+        ))
+        return f"{KEY_PREFIX}:response:{hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()}"
+
+    def _cached(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        cached = get_cache().get(key)
+        record(self.basename, hit=cached is not None)
+        if cached is not None:
+            data, headers = cached
+            # The validators were stored with the body, so a hit can still
+            # answer a conditional request without touching the database.
+            not_modified = conditional.conditional_response(request, headers)
+            if not_modified is not None:
+                return not_modified
+            return Response(data, headers=headers)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {name: response[name] for name in conditional.VALIDATOR_HEADERS if name in response}
+            get_cache().set(key, (response.data, headers), getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.cached_actions:
+            return super().list(request, *args, **kwargs)
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.cached_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self._cached(super().retrieve, request, *args, **kwargs)
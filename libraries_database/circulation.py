@@ -0,0 +1,276 @@
+"""
+Borrow/return bookkeeping shared by the single and batch endpoints in views.py.
+
+Every counter change is a conditional or relative ``UPDATE`` on
+``available_copies`` run inside the caller's transaction, so concurrent desks
+can neither oversell a title nor restock the same copy twice.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import availability, caching, counters
+from .models import Book, Borrowing, Member
+
+MAX_BATCH_SIZE = 100
+
+
+class CirculationError(Exception):
+    pass
+
+
+# -------------------------
+# SINGLE ITEM
+# -------------------------
+def borrow(book_id, member, borrow_date, due_date):
+    with transaction.atomic():
+        # Claim a copy with a single conditional UPDATE so concurrent
+        # borrowers can never push the counter below zero.
+        claimed = Book.objects.filter(pk=book_id, available_copies__gt=0).update(
+            available_copies=F('available_copies') - 1,
+            updated_at=timezone.now(),
+        )
+        if not claimed:
+            Book.objects.get(pk=book_id)
+            raise CirculationError('No copies available.')
+        caching.bump_version(Book)
+        availability.invalidate([int(book_id)])
+
+        # Any failure here rolls the claimed copy back with the transaction.
+        return Borrowing.objects.create(
+            member=member,
+            book_id=book_id,
+            borrow_date=borrow_date,
+            due_date=due_date,
+            late_fee=0
+        )
+
+
+def return_borrowing(borrowing):
+    if borrowing.return_date:
+        raise CirculationError('Book already returned.')
+
+    return_date = timezone.now().date()
+    late_fee = borrowing.calculate_late_fee(return_date)
+
+    with transaction.atomic():
+        # Only the request that flips return_date from NULL gets to put the
+        # copy back on the shelf.
+        returned = Borrowing.objects.filter(pk=borrowing.pk, return_date__isnull=True).update(
+            return_date=return_date,
+            late_fee=late_fee,
+            updated_at=timezone.now(),
+        )
+        if not returned:
+            raise CirculationError('Book already returned.')
+        _restock({borrowing.book_id: 1})
+        counters.borrowings_changed([borrowing.book_id], active=-1)
+
+    borrowing.return_date = return_date
+    borrowing.late_fee = late_fee
+    return borrowing
+
+
+# -------------------------
+# BATCHES
+# -------------------------
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _by_book(counts):
+    """``CASE book_id WHEN ... THEN n`` for a {book_id: n} mapping."""
+    return Case(
+        *[When(pk=book_id, then=Value(n)) for book_id, n in counts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _checkout(counts):
+    Book.objects.filter(pk__in=counts).update(
+        available_copies=F('available_copies') - _by_book(counts),
+        updated_at=timezone.now(),
+    )
+    caching.bump_version(Book, Borrowing)
+    availability.invalidate(counts)
+
+
+def _restock(counts):
+    Book.objects.filter(pk__in=counts).update(
+        available_copies=Least(F('available_copies') + _by_book(counts), F('total_copies')),
+        updated_at=timezone.now(),
+    )
+    caching.bump_version(Book, Borrowing)
+    availability.invalidate(counts)
+
+
+def _finish(results, atomic):
+    failed = sum(1 for result in results if result['status'] == 'error')
+    if atomic and failed:
+        for result in results:
+            if result['status'] == 'ok':
+                result['status'] = 'not_applied'
+    return {
+        'atomic': atomic,
+        'succeeded': sum(1 for result in results if result['status'] == 'ok'),
+        'failed': failed,
+        'results': results,
+    }
+
+
+def borrow_batch(items, atomic=True):
+    """
+    Borrow many books in one pass.
+
+    Books, members and active borrowings are each loaded with one query, all
+    new borrowings are written with one ``bulk_create`` and all counters with
+    one ``UPDATE``. With ``atomic`` any failing item aborts the whole batch;
+    otherwise the valid items are applied and the rest reported.
+    """
+    today = timezone.now().date()
+    parsed = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        parsed.append({
+            'book_id': _as_int(item.get('book_id')),
+            'member_id': _as_int(item.get('member_id')),
+            'borrow_date': parse_date(str(item.get('borrow_date') or '')),
+            'due_date': parse_date(str(item.get('due_date') or '')),
+        })
+    book_ids = {item['book_id'] for item in parsed if item['book_id'] is not None}
+    member_ids = {item['member_id'] for item in parsed if item['member_id'] is not None}
+
+    with transaction.atomic():
+        available = dict(
+            Book.objects.select_for_update().filter(pk__in=book_ids).values_list('pk', 'available_copies')
+        )
+        members = set(Member.objects.filter(pk__in=member_ids).values_list('pk', flat=True))
+        active = set(
+            Borrowing.objects.filter(
+                book_id__in=book_ids, member_id__in=member_ids, return_date__isnull=True
+            ).values_list('member_id', 'book_id')
+        )
+
+        results, accepted, checkouts = [], [], Counter()
+        for index, item in enumerate(parsed):
+            pair = (item['member_id'], item['book_id'])
+            if item['book_id'] not in available:
+                error = 'Book not found.'
+            elif item['member_id'] not in members:
+                error = 'Member not found.'
+            elif item['borrow_date'] is None or item['due_date'] is None:
+                error = 'borrow_date and due_date must be valid dates (YYYY-MM-DD).'
+            elif item['borrow_date'] > today:
+                error = 'Borrow date cannot be in the future.'
+            elif item['due_date'] < item['borrow_date']:
+                error = 'Due date cannot be before borrow date.'
+            elif pair in active:
+                error = 'This member already has this book borrowed and not returned.'
+            elif available[item['book_id']] - checkouts[item['book_id']] < 1:
+                error = 'No copies available.'
+            else:
+                error = None
+
+            if error:
+                results.append({'index': index, 'status': 'error', 'error': error})
+                continue
+            active.add(pair)
+            checkouts[item['book_id']] += 1
+            accepted.append((index, item))
+            results.append({
+                'index': index, 'status': 'ok',
+                'member_id': item['member_id'], 'book_id': item['book_id'],
+            })
+
+        if accepted and not (atomic and len(accepted) != len(parsed)):
+            Borrowing.objects.bulk_create(
+                Borrowing(
+                    member_id=item['member_id'],
+                    book_id=item['book_id'],
+                    borrow_date=item['borrow_date'],
+                    due_date=item['due_date'],
+                    late_fee=0,
+                )
+                for _, item in accepted
+            )
+            _checkout(checkouts)
+            book_ids = [item['book_id'] for _, item in accepted]
+            counters.borrowings_changed(book_ids, borrowed=1, active=1)
+            created = {
+                (member_id, book_id): pk
+                for member_id, book_id, pk in Borrowing.objects.filter(
+                    book_id__in=checkouts, member_id__in=member_ids, return_date__isnull=True
+                ).values_list('member_id', 'book_id', 'pk')
+            }
+            for index, item in accepted:
+                results[index]['borrowing_id'] = created.get((item['member_id'], item['book_id']))
+
+    return _finish(results, atomic)
+
+
+def return_batch(items, atomic=True):
+    """
+    Return many borrowings in one pass.
+
+    The borrowings are loaded with one query, stamped with one ``UPDATE`` that
+    only matches rows still out, and the copies restocked with one ``UPDATE``.
+    """
+    today = timezone.now().date()
+    borrowing_ids = [_as_int(item.get('borrowing_id') if isinstance(item, dict) else item) for item in items]
+
+    with transaction.atomic():
+        borrowings = Borrowing.objects.select_for_update().only(
+            'pk', 'book_id', 'member_id', 'due_date', 'return_date'
+        ).in_bulk([pk for pk in borrowing_ids if pk is not None])
+        member_types = dict(
+            Member.objects.filter(
+                pk__in={borrowing.member_id for borrowing in borrowings.values()}
+            ).values_list('pk', 'member_type')
+        )
+
+        results, fees, restocks, seen = [], {}, Counter(), set()
+        for index, borrowing_id in enumerate(borrowing_ids):
+            borrowing = borrowings.get(borrowing_id)
+            if borrowing is None:
+                error = 'Borrowing not found.'
+            elif borrowing.return_date or borrowing_id in seen:
+                error = 'Book already returned.'
+            else:
+                error = None
+
+            if error:
+                results.append({'index': index, 'status': 'error', 'error': error})
+                continue
+            seen.add(borrowing_id)
+            fees[borrowing_id] = borrowing.calculate_late_fee(today, member_types[borrowing.member_id])
+            restocks[borrowing.book_id] += 1
+            results.append({
+                'index': index, 'status': 'ok',
+                'borrowing_id': borrowing_id, 'late_fee': fees[borrowing_id],
+            })
+
+        if fees and not (atomic and len(fees) != len(borrowing_ids)):
+            returned = Borrowing.objects.filter(pk__in=fees, return_date__isnull=True).update(
+                return_date=today,
+                late_fee=Case(
+                    *[When(pk=pk, then=Value(fee)) for pk, fee in fees.items()],
+                    default=F('late_fee'),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+                updated_at=timezone.now(),
+            )
+            if returned != len(fees):
+                # Another desk returned one of these between our read and write.
+                raise CirculationError('Some borrowings were returned concurrently; retry the batch.')
+            _restock(restocks)
+            counters.borrowings_changed(list(restocks.elements()), active=-1)
+
+    return _finish(results, atomic)
@@ -0,0 +1,158 @@
+"""
+ETag / Last-Modified validators for list and retrieve responses.
+
+A detail response is validated by the row's ``updated_at``; a list response by
+``MAX(updated_at)`` and ``COUNT(*)`` over the filtered queryset, which moves on
+every insert, update and delete that can change the page. Keyset pages
+(``?cursor=``) skip that aggregate, which would bring back the full-table
+``COUNT(*)`` keyset pagination exists to avoid: they are validated by the
+page itself, its primary keys, its latest ``updated_at`` and whether it has
+neighbours, so a 304 there still costs the page query. Output that also
+depends on other tables (nested authors, a member's overdue flag) folds the
+response-cache versions of those models into the ETag. Matching
+``If-None-Match``/``If-Modified-Since`` requests get a 304 before anything is
+serialized.
+
+Last-Modified only follows the rows' own ``updated_at``. Clients should prefer
+the ETag, which Django evaluates first whenever both are sent.
+"""
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+from . import caching
+from .pagination import KeysetPagination
+
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def make_etag(*parts):
+    raw = repr(parts)
+    return f'W/"{hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def conditional_response(request, headers):
+    """
+    Return a 304 when the request's preconditions match ``headers``, else None.
+
+    ``headers`` holds the ``ETag``/``Last-Modified`` values the full response
+    would carry.
+    """
+    last_modified = parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None
+    response = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Add ``ETag``/``Last-Modified`` to list and retrieve, answering 304 when the
+    client's copy is current.
+
+    ``etag_dependencies`` lists other models whose writes change the serialized
+    output without touching this model's ``updated_at``. Models without an
+    ``updated_at`` column are validated by their own cache version instead.
+    """
+    last_modified_field = 'updated_at'
+    etag_dependencies = ()
+
+    def _tracks_last_modified(self, model):
+        return any(field.name == self.last_modified_field for field in model._meta.concrete_fields)
+
+    def get_etag_dependencies(self, model):
+        dependencies = tuple(self.etag_dependencies)
+        if not self._tracks_last_modified(model):
+            dependencies += (model,)
+        return dependencies
+
+    def get_etag_extra(self):
+        """Extra values that change the output without any write, e.g. the current date."""
+        return ()
+
+    def get_validators(self, model, last_modified, *identity):
+        request = self.request
+        query = sorted((key, tuple(values)) for key, values in request.query_params.lists())
+        headers = {
+            'ETag': make_etag(
+                model._meta.label_lower,
+                self.action,
+                request.accepted_renderer.format,
+                query,
+                identity,
+                last_modified.isoformat() if last_modified else None,
+                caching.get_versions(self.get_etag_dependencies(model)),
+                self.get_etag_extra(),
+            ),
+        }
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+        return headers
+
+    def _paginates_by_keyset(self):
+        paginator = self.paginator
+        if isinstance(paginator, KeysetPagination):
+            return True
+        keyset_class = getattr(paginator, 'keyset_class', None)
+        return keyset_class is not None and keyset_class.cursor_query_param in self.request.query_params
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self._paginates_by_keyset():
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.keyset_list(page)
+        if self._tracks_last_modified(queryset.model):
+            state = queryset.order_by().aggregate(
+                last_modified=Max(self.last_modified_field), count=Count('pk')
+            )
+        else:
+            state = {'last_modified': None, 'count': queryset.order_by().count()}
+        headers = self.get_validators(queryset.model, state['last_modified'], state['count'])
+        not_modified = conditional_response(request, headers)
+        if not_modified is not None:
+            return not_modified
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def keyset_list(self, page):
+        model = self.get_queryset().model
+        keyset = getattr(self.paginator, 'keyset', None) or self.paginator
+        last_modified = None
+        if self._tracks_last_modified(model):
+            last_modified = max(
+                (getattr(row, self.last_modified_field) for row in page), default=None
+            )
+        headers = self.get_validators(
+            model, last_modified,
+            [row.pk for row in page], keyset.has_next, keyset.has_previous,
+        )
+        not_modified = conditional_response(self.request, headers)
+        if not_modified is not None:
+            return not_modified
+
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.last_modified_field, None)
+        headers = self.get_validators(type(instance), last_modified, instance.pk)
+        not_modified = conditional_response(request, headers)
+        if not_modified is not None:
+            return not_modified
+        return Response(self.get_serializer(instance).data, headers=headers)
@@ -0,0 +1,205 @@
+"""
+Incrementally maintained totals behind /statistics/.
+
+Each total is a StatisticCounter row, kept globally (``books``) and per
+library (``books:library:3``). Writes adjust the affected rows with a single
+relative ``UPDATE`` inside the caller's transaction. Model signals cover
+ordinary saves and deletes; a cascading delete is counted out with grouped
+queries before it runs rather than row by row. The bulk and
+conditional-update paths in circulation.py and importers.py call ``apply``
+themselves. ``reconcile`` recounts everything and fixes any drift.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When, BigIntegerField
+
+from .models import Book, Borrowing, Library, Member, StatisticCounter
+
+BOOKS = 'books'
+MEMBERS = 'members'
+BORROWINGS = 'borrowings'
+ACTIVE_BORROWINGS = 'active_borrowings'
+
+GLOBAL_COUNTERS = (BOOKS, MEMBERS, BORROWINGS, ACTIVE_BORROWINGS)
+LIBRARY_COUNTERS = (BOOKS, BORROWINGS, ACTIVE_BORROWINGS)
+
+# Depends on the date, so signals cannot maintain it; accrue_late_fees sets it.
+OVERDUE_BORROWINGS = 'overdue_borrowings'
+
+
+def counter_key(name, library_id=None):
+    if library_id is None:
+        return name
+    return f"{name}:library:{library_id}"
+
+
+def apply(deltas):
+    """
+    Apply ``{(name, library_id): delta}`` with one UPDATE.
+
+    Each per-library delta is also added to the global total. Rows that do
+    not exist yet are left alone; ``snapshot`` reconciles before first use.
+    """
+    by_key = Counter()
+    for (name, library_id), delta in deltas.items():
+        by_key[counter_key(name)] += delta
+        if library_id is not None:
+            by_key[counter_key(name, library_id)] += delta
+    by_key = {key: delta for key, delta in by_key.items() if delta}
+    if not by_key:
+        return
+    StatisticCounter.objects.filter(key__in=by_key).update(
+        value=F('value') + Case(
+            *[When(key=key, then=Value(delta)) for key, delta in by_key.items()],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        )
+    )
+
+
+def set_value(key, value):
+    StatisticCounter.objects.update_or_create(key=key, defaults={'value': value})
+
+
+def libraries_for_books(book_ids):
+    return dict(Book.objects.filter(pk__in=set(book_ids)).values_list('pk', 'library_id'))
+
+
+def borrowings_changed(book_ids, borrowed=0, active=0):
+    """Record ``borrowed`` new and ``active`` newly active/returned borrowings per book id list."""
+    libraries = libraries_for_books(book_ids)
+    deltas = Counter()
+    for book_id in book_ids:
+        library_id = libraries.get(book_id)
+        deltas[(BORROWINGS, library_id)] += borrowed
+        deltas[(ACTIVE_BORROWINGS, library_id)] += active
+    apply(deltas)
+
+
+def book_moved(book_id, old_library_id, new_library_id):
+    """Move a book and its borrowings from one library's counters to another's."""
+    borrowings = Borrowing.objects.filter(book_id=book_id).aggregate(
+        total=Count('pk'), active=Count('pk', filter=Q(return_date__isnull=True))
+    )
+    deltas = Counter()
+    for library_id, sign in ((old_library_id, -1), (new_library_id, 1)):
+        deltas[(BOOKS, library_id)] += sign
+        deltas[(BORROWINGS, library_id)] += sign * borrowings['total']
+        deltas[(ACTIVE_BORROWINGS, library_id)] += sign * borrowings['active']
+    # The global totals net out to zero.
+    apply(deltas)
+
+
+def _borrowings_removed(borrowings):
+    deltas = Counter()
+    rows = borrowings.values_list('book__library_id').annotate(
+        total=Count('pk'), active=Count('pk', filter=Q(return_date__isnull=True))
+    ).order_by()
+    for library_id, total, active in rows:
+        deltas[(BORROWINGS, library_id)] -= total
+        deltas[(ACTIVE_BORROWINGS, library_id)] -= active
+    return deltas
+
+
+def borrowings_deleted(borrowings):
+    """Count out a queryset of borrowings about to be deleted, grouped by library."""
+    apply(_borrowings_removed(borrowings))
+
+
+def books_deleted(books):
+    """Count out a queryset of books about to be deleted, and their borrowings, grouped by library."""
+    deltas = Counter()
+    for library_id, total in books.values_list('library_id').annotate(total=Count('pk')).order_by():
+        deltas[(BOOKS, library_id)] -= total
+    deltas.update(_borrowings_removed(Borrowing.objects.filter(book__in=books)))
+    apply(deltas)
+
+
+def create_library_counters(library_id):
+    StatisticCounter.objects.bulk_create(
+        [StatisticCounter(key=counter_key(name, library_id)) for name in LIBRARY_COUNTERS],
+        ignore_conflicts=True,
+    )
+
+
+def delete_library_counters(library_id):
+    StatisticCounter.objects.filter(
+        key__in=[counter_key(name, library_id) for name in LIBRARY_COUNTERS]
+    ).delete()
+
+
+def _is_managed(key):
+    return key in GLOBAL_COUNTERS or ':library:' in key
+
+
+def count_all():
+    """Recount every total from the base tables. Returns ``{key: value}``."""
+    values = defaultdict(int)
+    for library_id in Library.objects.values_list('pk', flat=True):
+        for name in LIBRARY_COUNTERS:
+            values[counter_key(name, library_id)] = 0
+    for library_id, total in Book.objects.values_list('library_id').annotate(total=Count('pk')).order_by():
+        values[counter_key(BOOKS, library_id)] = total
+        values[BOOKS] += total
+    borrowings = Borrowing.objects.values_list('book__library_id').annotate(
+        total=Count('pk'), active=Count('pk', filter=Q(return_date__isnull=True))
+    ).order_by()
+    for library_id, total, active in borrowings:
+        values[counter_key(BORROWINGS, library_id)] = total
+        values[counter_key(ACTIVE_BORROWINGS, library_id)] = active
+        values[BORROWINGS] += total
+        values[ACTIVE_BORROWINGS] += active
+    values[MEMBERS] = Member.objects.count()
+    for name in GLOBAL_COUNTERS:
+        values.setdefault(name, 0)
+    return dict(values)
+
+
+def reconcile():
+    """Rewrite every counter from a fresh count. Returns ``{key: (old, new)}`` for the ones that drifted."""
+    with transaction.atomic():
+        current = dict(StatisticCounter.objects.select_for_update().values_list('key', 'value'))
+        fresh = count_all()
+        stale = [key for key in current if key not in fresh and _is_managed(key)]
+        StatisticCounter.objects.filter(key__in=stale).delete()
+        drift = {
+            key: (current.get(key), value)
+            for key, value in fresh.items()
+            if current.get(key) != value
+        }
+        StatisticCounter.objects.filter(key__in=drift).delete()
+        StatisticCounter.objects.bulk_create([StatisticCounter(key=key, value=fresh[key]) for key in drift])
+    return drift
+
+
+def snapshot(by_library=False):
+    """Read the totals with one query, reconciling once if they were never initialised."""
+    rows = StatisticCounter.objects.all() if by_library else StatisticCounter.objects.filter(key__in=GLOBAL_COUNTERS)
+    values = dict(rows.values_list('key', 'value'))
+    if not all(name in values for name in GLOBAL_COUNTERS):
+        reconcile()
+        values = dict(rows.values_list('key', 'value'))
+
+    data = {
+        'total_books': values[BOOKS],
+        'total_members': values[MEMBERS],
+        'total_borrowings': values[BORROWINGS],
+        'active_borrowings': values[ACTIVE_BORROWINGS],
+    }
+    if by_library:
+        libraries = defaultdict(dict)
+        for key, value in values.items():
+            name, _, library_id = key.partition(':library:')
+            if library_id:
+                libraries[int(library_id)][name] = value
+        data['libraries'] = [
+            {
+                'library_id': library_id,
+                'total_books': totals.get(BOOKS, 0),
+                'total_borrowings': totals.get(BORROWINGS, 0),
+                'active_borrowings': totals.get(ACTIVE_BORROWINGS, 0),
+            }
+            for library_id, totals in sorted(libraries.items())
+        ]
+    return data
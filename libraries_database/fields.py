@@ -1,4 +1,5 @@
 import phonenumbers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
 class PhoneNumberField(serializers.CharField):
@@ -13,3 +14,70 @@ class PhoneNumberField(serializers.CharField):
         if not phonenumbers.is_valid_number(parsed):
             raise serializers.ValidationError("Phone number is not valid.")
         return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+class BulkPrimaryKeyRelatedField(serializers.ManyRelatedField):
+    """
+    A list of primary keys resolved with one ``in_bulk`` query.
+
+    ``PrimaryKeyRelatedField(many=True)`` runs a SELECT per submitted id. This
+    field looks the whole list up at once, reports every unknown id in a
+    single error and returns the objects in submitted order, without
+    duplicates. Under a ``many=True`` list serializer the ids of all items
+    are resolved together on first use, so a bulk create still costs one
+    query per field.
+    """
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk(s) {pk_values} - object(s) do not exist.',
+        'incorrect_type': 'Incorrect type. Expected pk values, received {values}.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(child_relation=serializers.PrimaryKeyRelatedField(queryset=queryset), **kwargs)
+
+    def _to_pk(self, value):
+        try:
+            return self.child_relation.get_queryset().model._meta.pk.to_python(value)
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+
+    def _lookup(self, pks):
+        root = self.root
+        if not (
+            isinstance(root, serializers.ListSerializer)
+            and self.parent.parent is root
+            and isinstance(getattr(root, 'initial_data', None), list)
+        ):
+            return self.child_relation.get_queryset().in_bulk(pks)
+
+        # Resolve the ids of every item in the list the first time any item asks.
+        resolved = root.__dict__.setdefault('_bulk_related_objects', {})
+        if self.field_name not in resolved:
+            every_pk = set()
+            for item in root.initial_data:
+                values = item.get(self.field_name) if isinstance(item, dict) else None
+                if isinstance(values, list):
+                    every_pk.update(pk for pk in map(self._to_pk, values) if pk is not None)
+            resolved[self.field_name] = self.child_relation.get_queryset().in_bulk(every_pk)
+        return resolved[self.field_name]
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        data = list(data)
+        if not self.allow_empty and not data:
+            self.fail('empty')
+
+        pks = [self._to_pk(value) for value in data]
+        invalid = [value for value, pk in zip(data, pks) if pk is None]
+        if invalid:
+            self.fail('incorrect_type', values=invalid)
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return []
+
+        objects = self._lookup(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [objects[pk] for pk in pks]
@@ -1,6 +1,60 @@
 import django_filters
-from django.db.models import Q
-from .models import Library, Book, Author, Category, Member, Borrowing, Review
+from django import forms
+from django.db.models import Exists, OuterRef, Q
+from django_filters.widgets import QueryArrayWidget
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from rest_framework.settings import api_settings
+
+from . import fuzzy, search
+from .models import Library, Book, Author, BookAuthor, BookCategory, Category, Member, Borrowing, Review
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    ``?search=`` answered from the search index in search.py instead of
+    ``LIKE '%term%'`` over joined tables.
+
+    Results are ordered by relevance unless the client asked for an
+    ``?ordering=``. ``search_fields`` is not used.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not search.parse_query(query):
+            return queryset
+        queryset = search.search(queryset, query, using=queryset.db)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.order_by('-search_rank', 'pk')
+
+
+class FuzzyNameFilter(BaseFilterBackend):
+    """
+    ``?name_fuzzy=`` answered from the name trigram tables in fuzzy.py, so
+    misspelled names still match.
+
+    Results are ordered by similarity unless the client asked for an
+    ``?ordering=``.
+    """
+    param = 'name_fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.param, '').strip()
+        if not query:
+            return queryset
+        queryset = fuzzy.filter_names(queryset, query)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.order_by('-name_similarity', 'pk')
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.param,
+            'required': False,
+            'in': 'query',
+            'description': "Full or partial name, typos allowed; best matches first.",
+            'schema': {'type': 'string'},
+        }]
 
 
 class LibraryFilter(django_filters.FilterSet):
@@ -21,6 +75,50 @@ class LibraryFilter(django_filters.FilterSet):
 
 
 
+class IdListField(forms.Field):
+    """
+    Distinct integer IDs from ``?key=1&key=2``, ``?key[]=1`` or ``?key=1,2``.
+
+    IDs are not looked up, so unknown ones simply match nothing.
+    """
+    widget = QueryArrayWidget
+    max_ids = 50
+
+    def to_python(self, value):
+        ids = []
+        for item in value or []:
+            for part in str(item).split(','):
+                if not part.strip():
+                    continue
+                try:
+                    ids.append(int(part))
+                except ValueError:
+                    raise forms.ValidationError("Enter whole-number IDs separated by commas.", code='invalid')
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.max_ids:
+            raise forms.ValidationError(f"At most {self.max_ids} IDs are allowed.", code='max_ids')
+        return ids
+
+
+class IdListFilter(django_filters.Filter):
+    field_class = IdListField
+
+
+def linked_to(queryset, through, column, ids, match_all=False):
+    """
+    Books of ``queryset`` linked through ``through`` to any (or all) of ``ids``.
+
+    Each condition is a correlated EXISTS on the (book, column) unique index
+    rather than a join, so no row repeats and no DISTINCT is needed.
+    """
+    links = through.objects.filter(book_id=OuterRef('pk'))
+    if not match_all:
+        return queryset.filter(Exists(links.filter(**{f'{column}__in': ids})))
+    for pk in ids:
+        queryset = queryset.filter(Exists(links.filter(**{column: pk})))
+    return queryset
+
+
 class BookFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(method='filter_title')
     isbn = django_filters.CharFilter(field_name='isbn', lookup_expr='exact')
@@ -31,32 +129,29 @@ class BookFilter(django_filters.FilterSet):
     total_copies__gte = django_filters.NumberFilter(field_name='total_copies', lookup_expr='gte')
     total_copies__lte = django_filters.NumberFilter(field_name='total_copies', lookup_expr='lte')
 
-    authors = django_filters.ModelMultipleChoiceFilter(
-        method='filter_authors',
-        queryset=Author.objects.all(),
-        conjoined=False,
+    authors = IdListFilter(method='filter_authors', help_text="Books by any of these author IDs.")
+    authors__all = IdListFilter(
+        field_name='authors', method='filter_all_authors', help_text="Books by all of these author IDs."
     )
-
-    categories = django_filters.ModelMultipleChoiceFilter(
-        method='filter_categories',
-        queryset=Category.objects.all(),
-        conjoined=False,
+    categories = IdListFilter(method='filter_categories', help_text="Books in any of these category IDs.")
+    categories__all = IdListFilter(
+        field_name='categories', method='filter_all_categories', help_text="Books in all of these category IDs."
     )
 
     def filter_title(self, queryset, name, value):
         return queryset.filter(title__icontains=value)
 
     def filter_authors(self, queryset, name, value):
-        if not value:
-            return queryset
-        author_ids = [author.author_id for author in value]
-        return queryset.filter(bookauthor__author_id__in=author_ids).distinct()
+        return linked_to(queryset, BookAuthor, 'author_id', value)
+
+    def filter_all_authors(self, queryset, name, value):
+        return linked_to(queryset, BookAuthor, 'author_id', value, match_all=True)
 
     def filter_categories(self, queryset, name, value):
-        if not value:
-            return queryset
-        category_ids = [category.category_id for category in value]
-        return queryset.filter(bookcategory__category_id__in=category_ids).distinct()
+        return linked_to(queryset, BookCategory, 'category_id', value)
+
+    def filter_all_categories(self, queryset, name, value):
+        return linked_to(queryset, BookCategory, 'category_id', value, match_all=True)
 
     class Meta:
         model = Book
@@ -64,8 +159,8 @@ class BookFilter(django_filters.FilterSet):
             'title', 'isbn', 'publication_date', 'library',
             'available_copies__gte', 'available_copies__lte',
             'total_copies__gte', 'total_copies__lte',
-            'authors',  # Add these so they are recognized
-            'categories',
+            'authors', 'authors__all',
+            'categories', 'categories__all',
         ]
 
 
@@ -104,6 +199,7 @@ class MemberFilter(django_filters.FilterSet):
     contact_email = django_filters.CharFilter(field_name='contact_email', lookup_expr='icontains')
     phone_number = django_filters.CharFilter(field_name='phone_number', lookup_expr='icontains')
     member_type = django_filters.CharFilter(field_name='member_type', lookup_expr='exact')
+    has_overdue = django_filters.BooleanFilter(method='filter_has_overdue')
 
     def filter_first_name(self, queryset, name, value):
         return queryset.filter(first_name__icontains=value)
@@ -111,9 +207,12 @@ class MemberFilter(django_filters.FilterSet):
     def filter_last_name(self, queryset, name, value):
         return queryset.filter(last_name__icontains=value)
 
+    def filter_has_overdue(self, queryset, name, value):
+        return queryset.filter_has_overdue(value)
+
     class Meta:
         model = Member
-        fields = ['first_name', 'last_name', 'contact_email', 'phone_number', 'member_type']
+        fields = ['first_name', 'last_name', 'contact_email', 'phone_number', 'member_type', 'has_overdue']
 
 
 class BorrowingFilter(django_filters.FilterSet):
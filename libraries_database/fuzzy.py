@@ -0,0 +1,94 @@
+"""
+Trigram index behind ``?name_fuzzy=`` on /authors/ and /members/.
+
+A full name is normalized like the search index (lowercase, accents
+stripped), and each word is padded as ``"  word "`` and cut into three
+character slices, the way PostgreSQL's pg_trgm does. The slices are stored
+in AuthorNameTrigram and MemberNameTrigram, which signals.py keeps current
+when a name is created or changed.
+
+A query matches a name holding at least ``THRESHOLD`` of the query's
+trigrams. Matches are ranked by trigram similarity: shared trigrams over the
+trigrams of either side. Both come from the (trigram, person) index alone,
+so "Dostoyevsky", "Dostoevski" and "dostoevsky" all find "Fyodor Dostoevsky"
+without scanning the Author or Member table.
+"""
+import math
+
+from django.apps import apps as global_apps
+from django.db.models import Count, FloatField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast
+
+from .search import tokenize
+
+THRESHOLD = 0.5
+MAX_QUERY_TRIGRAMS = 60
+CHUNK_SIZE = 2000
+
+# Person model -> (trigram model, foreign key to the person)
+TABLES = {
+    'Author': ('AuthorNameTrigram', 'author'),
+    'Member': ('MemberNameTrigram', 'member'),
+}
+
+
+def trigrams(text):
+    """Distinct trigrams of the words of ``text``."""
+    grams = {}
+    for word in tokenize(text):
+        padded = f"  {word} "
+        for start in range(len(padded) - 2):
+            grams[padded[start:start + 3]] = None
+    return list(grams)
+
+
+def _table(model, apps=global_apps):
+    name, column = TABLES[model._meta.object_name]
+    return apps.get_model('libraries_database', name), column
+
+
+def index_names(model, pks, apps=global_apps):
+    """Rewrite the trigrams of the ``model`` rows in ``pks``."""
+    table, column = _table(model, apps)
+    pks = list(dict.fromkeys(pks))
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start:start + CHUNK_SIZE]
+        table.objects.filter(**{f'{column}_id__in': chunk}).delete()
+        rows = []
+        for pk, first_name, last_name in model.objects.filter(pk__in=chunk).values_list(
+            'pk', 'first_name', 'last_name'
+        ):
+            grams = trigrams(f"{first_name} {last_name}")
+            rows.extend(
+                table(**{f'{column}_id': pk}, trigram=gram, name_trigrams=len(grams)) for gram in grams
+            )
+        table.objects.bulk_create(rows, batch_size=CHUNK_SIZE)
+
+
+def rebuild(model, apps=global_apps):
+    """Refill the trigram table of ``model`` from every row. Returns the number of rows indexed."""
+    table, _ = _table(model, apps)
+    table.objects.all().delete()
+    pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+    index_names(model, pks, apps)
+    return len(pks)
+
+
+def filter_names(queryset, query):
+    """
+    Rows of ``queryset`` whose name is close to ``query``, annotated with
+    ``name_similarity`` between 0 and 1.
+    """
+    grams = trigrams(query)[:MAX_QUERY_TRIGRAMS]
+    if not grams:
+        return queryset.none().annotate(name_similarity=Value(0.0, output_field=FloatField()))
+    table, column = _table(queryset.model)
+    matched = table.objects.filter(trigram__in=grams).order_by()
+    needed = math.ceil(len(grams) * THRESHOLD)
+    candidates = matched.values(column).annotate(shared=Count('pk')).filter(shared__gte=needed).values(column)
+    similarity = matched.filter(**{column: OuterRef('pk')}).values(column).annotate(
+        similarity=Cast(Count('pk'), FloatField()) / (len(grams) + Max('name_trigrams') - Count('pk'))
+    ).values('similarity')
+    return queryset.filter(pk__in=candidates).annotate(
+        name_similarity=Subquery(similarity, output_field=FloatField())
+    )
@@ -0,0 +1,296 @@
+"""
+Streaming bulk import of the book catalog from CSV or NDJSON.
+
+Rows are consumed lazily and written in fixed-size chunks, so memory stays
+flat however large the input is. Per chunk the importer runs one ISBN lookup
+against the unique index, one lookup (plus at most one bulk insert) each for
+libraries, authors and categories, one ``bulk_create`` for the books and one
+for each through table. A chunk that loses an ISBN to a concurrent import
+is rolled back and retried once, so those rows count as duplicates.
+
+CSV columns: title, isbn, publication_date, total_copies, available_copies,
+library, authors, categories (authors/categories separated by ``;``, authors
+written as "First Last"). NDJSON objects use the same keys; authors and
+categories may also be JSON lists.
+"""
+import csv
+import io
+import json
+import time
+from collections import Counter
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from . import autocomplete, caching, counters, fuzzy, search
+from .models import Author, Book, BookAuthor, BookCategory, Category, Library
+
+FORMATS = ('csv', 'ndjson')
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(filename, default=None):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return default
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input row from a text or binary stream."""
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def _split(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(';')
+    return [' '.join(str(item).split()) for item in value if str(item).strip()]
+
+
+def _author_key(name):
+    # Same normalisation AuthorSerializer applies to names.
+    first, _, last = name.title().rpartition(' ')
+    return (first, last) if first else (last, '')
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, row_number, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(self.rows / elapsed, 1) if elapsed else None,
+        }
+
+
+def _int_or(value, default):
+    # Empty CSV cells and missing keys take the default; 0 is a value.
+    return default if value is None or value == '' else int(value)
+
+
+def _clean_row(row):
+    """Return ``(book_kwargs, author_names, category_names)`` or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object.")
+    title = ' '.join(str(row.get('title') or '').split())
+    isbn = str(row.get('isbn') or '').strip()
+    if not title or len(title) > Book._meta.get_field('title').max_length:
+        raise ValueError("title is required and must be at most 50 characters.")
+    if not isbn or len(isbn) > Book._meta.get_field('isbn').max_length:
+        raise ValueError("isbn is required and must be at most 20 characters.")
+
+    publication_date = row.get('publication_date') or None
+    if publication_date is not None:
+        publication_date = parse_date(str(publication_date))
+        if publication_date is None:
+            raise ValueError("publication_date must be YYYY-MM-DD.")
+
+    try:
+        library_id = int(row.get('library'))
+        total_copies = _int_or(row.get('total_copies'), 1)
+        available_copies = _int_or(row.get('available_copies'), total_copies)
+    except (TypeError, ValueError):
+        raise ValueError("library, total_copies and available_copies must be integers.")
+    if not 0 <= available_copies <= total_copies:
+        raise ValueError("Available copies must be between 0 and total copies.")
+
+    authors, categories = _split(row.get('authors')), _split(row.get('categories'))
+    if any(len(part) > 50 for name in authors for part in _author_key(name)):
+        raise ValueError("Author first and last names must be at most 50 characters.")
+    if any(len(name) > 50 for name in categories):
+        raise ValueError("Category names must be at most 50 characters.")
+
+    book = {
+        'title': title,
+        'isbn': isbn,
+        'publication_date': publication_date,
+        'total_copies': total_copies,
+        'available_copies': available_copies,
+        'library_id': library_id,
+    }
+    return book, authors, categories
+
+
+def _resolve_authors(names):
+    keys = {_author_key(name) for name in names}
+    if not keys:
+        return {}
+
+    def lookup():
+        found = {}
+        matches = Author.objects.filter(
+            first_name__in={first for first, _ in keys}, last_name__in={last for _, last in keys}
+        ).order_by('-pk').values_list('first_name', 'last_name', 'pk')
+        for first, last, pk in matches:
+            if (first, last) in keys:
+                found[(first, last)] = pk
+        return found
+
+    found = lookup()
+    missing = keys - found.keys()
+    if missing:
+        Author.objects.bulk_create(Author(first_name=first, last_name=last) for first, last in missing)
+        found = lookup()
+        fuzzy.index_names(Author, [found[key] for key in missing])
+    return found
+
+
+def _resolve_categories(names):
+    names = set(names)
+    if not names:
+        return {}
+
+    def lookup():
+        return dict(Category.objects.filter(category__in=names).order_by('-pk').values_list('category', 'pk'))
+
+    found = lookup()
+    missing = names - found.keys()
+    if missing:
+        Category.objects.bulk_create(Category(category=name, descriptions='') for name in missing)
+        found = lookup()
+    return found
+
+
+def _import_chunk(numbered_rows, report):
+    pending = {}
+    for row_number, row in numbered_rows:
+        try:
+            book, authors, categories = _clean_row(row)
+        except ValueError as e:
+            report.error(row_number, str(e))
+            continue
+        if book['isbn'] in pending:
+            report.duplicates += 1
+            continue
+        pending[book['isbn']] = (row_number, book, authors, categories)
+    if not pending:
+        return
+
+    for attempt in range(2):
+        rows = dict(pending)
+        try:
+            duplicates, errors = _write_chunk(rows)
+        except IntegrityError:
+            # Another import inserted one of these ISBNs between the lookup and
+            # the insert. The chunk was rolled back; the retry's lookup sees
+            # those rows and counts them as duplicates.
+            if not attempt:
+                continue
+            for row_number, _, _, _ in pending.values():
+                report.error(row_number, "Conflicted with a concurrent import; retry this row.")
+            return
+        report.duplicates += duplicates
+        for row_number, message in errors:
+            report.error(row_number, message)
+        report.created += len(rows)
+        return
+
+
+def _existing_isbns(isbns):
+    return set(Book.objects.filter(isbn__in=isbns).values_list('isbn', flat=True))
+
+
+def _write_chunk(pending):
+    """
+    Insert the cleaned rows of ``pending`` in one transaction.
+
+    Rows that are skipped are removed from ``pending``, which is left holding
+    the books created. Returns ``(duplicates, [(row_number, error), ...])``.
+    """
+    errors = []
+    with transaction.atomic():
+        existing = _existing_isbns(pending)
+        for isbn in existing:
+            del pending[isbn]
+
+        libraries = set(
+            Library.objects.filter(
+                pk__in={book['library_id'] for _, book, _, _ in pending.values()}
+            ).values_list('pk', flat=True)
+        )
+        for isbn, (row_number, book, _, _) in list(pending.items()):
+            if book['library_id'] not in libraries:
+                errors.append((row_number, f"Library {book['library_id']} does not exist."))
+                del pending[isbn]
+        if not pending:
+            return len(existing), errors
+
+        author_ids = _resolve_authors(name for _, _, authors, _ in pending.values() for name in authors)
+        category_ids = _resolve_categories(name for _, _, _, categories in pending.values() for name in categories)
+
+        Book.objects.bulk_create(Book(**book) for _, book, _, _ in pending.values())
+        # Re-read the keys rather than relying on bulk_create returning them,
+        # which MySQL does not do.
+        book_ids = dict(Book.objects.filter(isbn__in=pending).values_list('isbn', 'pk'))
+
+        BookAuthor.objects.bulk_create(
+            (
+                BookAuthor(book_id=book_ids[isbn], author_id=author_ids[_author_key(name)])
+                for isbn, (_, _, authors, _) in pending.items() for name in authors
+            ),
+            ignore_conflicts=True,
+        )
+        BookCategory.objects.bulk_create(
+            (
+                BookCategory(book_id=book_ids[isbn], category_id=category_ids[name])
+                for isbn, (_, _, _, categories) in pending.items() for name in categories
+            ),
+            ignore_conflicts=True,
+        )
+        counters.apply(Counter((counters.BOOKS, book['library_id']) for _, book, _, _ in pending.values()))
+        caching.bump_version(Book, Author, Category, BookAuthor, BookCategory)
+        search.index_books(book_ids.values())
+        # bulk_create sends no post_save; reload the suggestions after the import commits.
+        transaction.on_commit(autocomplete.clear)
+    return len(existing), errors
+
+
+def import_books(rows, chunk_size=1000):
+    """Import an iterable of row dicts chunk by chunk and return an ImportReport."""
+    report = ImportReport()
+    numbered = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return report
+        report.rows += len(chunk)
+        _import_chunk(chunk, report)
@@ -0,0 +1,141 @@
+"""
+Per-request SQL and latency accounting behind RequestMetricsMiddleware.
+
+The middleware opens a ``RequestMetrics`` for each request in a context
+variable. ``QueryRecorder`` (installed with ``connection.execute_wrapper``)
+and ``measure`` add to it while the request runs. Finished requests are folded
+into per-route histograms keyed by the resolved URL name. Everything is in
+process memory and costs a couple of ``perf_counter`` calls per query.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_ms', 'timers')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.timers = {}
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def resume_request(metrics):
+    """Make ``metrics`` current again, e.g. while a streaming body is iterated."""
+    return _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def measure(name):
+    """Add the wall time of the block to the current request's ``name`` timer."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timers[name] = metrics.timers.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts queries and their time for the current request."""
+
+    def __call__(self, execute, sql, params, many, context):
+        metrics = _current.get()
+        if metrics is None:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.queries += 1
+            metrics.db_ms += (time.perf_counter() - start) * 1000
+
+
+class RouteHistogram:
+    __slots__ = ('count', 'total_ms', 'db_ms', 'queries', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        # One slot per bound plus the overflow (+Inf) slot; not cumulative.
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'db_ms': self.db_ms,
+            'queries': self.queries,
+            'buckets': list(self.buckets),
+        }
+
+
+_histograms_lock = threading.Lock()
+_histograms = {}
+_connections_opened = 0
+
+
+def count_connection():
+    global _connections_opened
+    with _histograms_lock:
+        _connections_opened += 1
+
+
+def connections_opened():
+    """New database connections opened by this process."""
+    return _connections_opened
+
+
+def observe(route, total_ms, metrics):
+    with _histograms_lock:
+        histogram = _histograms.get(route)
+        if histogram is None:
+            histogram = _histograms[route] = RouteHistogram()
+        histogram.count += 1
+        histogram.total_ms += total_ms
+        histogram.db_ms += metrics.db_ms
+        histogram.queries += metrics.queries
+        histogram.buckets[bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+
+
+def route_histograms():
+    """``{route: {...}}`` snapshot of this process's histograms."""
+    with _histograms_lock:
+        return {route: histogram.as_dict() for route, histogram in _histograms.items()}
+
+
+def reset_route_histograms():
+    global _connections_opened
+    with _histograms_lock:
+        _histograms.clear()
+        _connections_opened = 0
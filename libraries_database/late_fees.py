@@ -0,0 +1,92 @@
+"""
+Set-based accrual of late fees on borrowings that are still out.
+
+``accrue_late_fees`` walks the borrowing table in primary-key ranges and
+brings ``late_fee`` up to date for every overdue, unreturned row in a range
+with a single ``UPDATE``. The fee is a pure function of the accrual date, due
+date and member type, so re-running is harmless. Rows already accrued for the
+date are skipped, so a second run on the same day touches nothing.
+"""
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, Func, IntegerField, Max, Min, OuterRef, Q, Subquery, Value, When,
+)
+from django.utils import timezone
+
+from . import caching, counters
+from .models import Borrowing, LATE_FEE_PER_DAY, Member, late_fee_rate
+
+FEE_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+
+class DaysBetween(Func):
+    """Whole days from ``start`` to ``end`` (both dates), computed in the database."""
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: subtracting two dates yields an integer day count.
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='DATEDIFF', **extra_context)
+
+
+def member_rate():
+    """Correlated subquery giving the daily rate of each borrowing's member."""
+    rates = Case(
+        *[When(member_type=value, then=Value(late_fee_rate(value))) for value in Member.MemberType.values],
+        default=Value(LATE_FEE_PER_DAY),
+        output_field=FEE_FIELD,
+    )
+    return Subquery(
+        Member.objects.filter(pk=OuterRef('member_id')).annotate(rate=rates).values('rate')[:1],
+        output_field=FEE_FIELD,
+    )
+
+
+def accrue_late_fees(as_of=None, chunk_size=10000, full=False):
+    """
+    Set ``late_fee`` on overdue, unreturned borrowings as of ``as_of`` (today).
+
+    Only rows not yet accrued for ``as_of`` are touched unless ``full`` is
+    set, which recomputes everything (e.g. after a rate change). Also records
+    the overdue total for the metrics endpoint. Returns the number of rows
+    updated.
+    """
+    as_of = as_of or timezone.now().date()
+    due = Borrowing.objects.filter(return_date__isnull=True, due_date__lt=as_of)
+    if not full:
+        due = due.filter(Q(fees_accrued_on__isnull=True) | Q(fees_accrued_on__lt=as_of))
+
+    # The job is the only place the date-dependent overdue total can be kept.
+    counters.set_value(
+        counters.OVERDUE_BORROWINGS,
+        Borrowing.objects.filter(return_date__isnull=True, due_date__lt=as_of).count(),
+    )
+
+    bounds = due.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+
+    fee = ExpressionWrapper(DaysBetween(Value(as_of), F('due_date')) * member_rate(), output_field=FEE_FIELD)
+    updated = 0
+    for start in range(bounds['first'], bounds['last'] + 1, chunk_size):
+        with transaction.atomic():
+            updated += due.filter(pk__gte=start, pk__lt=start + chunk_size).update(
+                late_fee=fee,
+                fees_accrued_on=as_of,
+                updated_at=timezone.now(),
+            )
+    if updated:
+        caching.bump_version(Borrowing)
+    return updated
@@ -0,0 +1,48 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from faker import Faker
+
+from libraries_database.autocomplete import PrefixIndex
+from libraries_database.benchmarking import summarize, timed
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a title prefix index with synthetic titles in memory (no database) and "
+        "report load time, index size and lookup latency for 1 to 6 character prefixes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000000, help="Titles to index.")
+        parser.add_argument('--lookups', type=int, default=2000, help="Lookups per prefix length.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        faker = Faker()
+        faker.seed_instance(options['seed'])
+        # A pool of words keeps generation fast; titles are 1-6 of them.
+        words = [faker.word().capitalize() for _ in range(5000)] + [faker.last_name() for _ in range(2000)]
+        titles = [' '.join(rng.choices(words, k=rng.randint(1, 6))) for _ in range(options['titles'])]
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = PrefixIndex().load(enumerate(titles, start=1))
+        load_seconds = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"Indexed {len(index)} titles in {load_seconds:.1f}s, "
+            f"{size / 2 ** 20:.0f} MiB ({size / len(index):.0f} bytes per title)"
+        )
+
+        for length in range(1, 7):
+            samples = []
+            for _ in range(options['lookups']):
+                prefix = rng.choice(titles)[:length]
+                with timed(samples):
+                    index.lookup(prefix, 10)
+            self.stdout.write(f"prefix length {length}: {summarize(samples)}")
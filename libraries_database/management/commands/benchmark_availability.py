@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from libraries_database import availability
+from libraries_database.benchmarking import benchmark_database, summarize, timed
+from libraries_database.models import Book, Library
+from libraries_database.seeding import synthetic_isbn
+
+
+class Command(BaseCommand):
+    help = (
+        "Time GET /books/availability/?ids=... for 1, 50 and 500 ids, cold (cache "
+        "cleared before every request) and warm, and report p50/p99 latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000, help="Catalog size to seed.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per batch size.")
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 500])
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Run against the configured database instead of a throwaway test database.",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(use_existing=options['use_existing_db']):
+            self.run(options['books'], options['requests'], options['sizes'])
+
+    def seed(self, books):
+        prefix = time.time_ns()
+        library = Library.objects.create(
+            library_name="Benchmark Library",
+            campus_location="Benchmark",
+            contact_email=f"bench-{prefix}@example.com",
+            phone_number=str(prefix)[-15:],
+        )
+        Book.objects.bulk_create(
+            (
+                Book(
+                    title=f"Title {i}",
+                    isbn=synthetic_isbn(prefix, i),
+                    total_copies=5,
+                    available_copies=5,
+                    library=library,
+                )
+                for i in range(books)
+            ),
+            batch_size=1000,
+        )
+        return list(Book.objects.filter(library=library).values_list('pk', flat=True))
+
+    def run(self, books, requests, sizes):
+        book_ids = self.seed(books)
+        client = Client()
+        url = reverse('book-availability-batch')
+        for size in sizes:
+            for mode in ('cold', 'warm'):
+                samples = []
+                availability.clear()
+                for i in range(requests):
+                    start = (i * size) % max(1, len(book_ids) - size)
+                    ids = ','.join(str(pk) for pk in book_ids[start:start + size])
+                    if mode == 'cold':
+                        availability.clear()
+                    with timed(samples):
+                        response = client.get(url, {'ids': ids})
+                    assert response.status_code == 200, response.content
+                self.stdout.write(f"ids={size} {mode}: {summarize(samples)}")
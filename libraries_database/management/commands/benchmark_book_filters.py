@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.http import QueryDict
+
+from libraries_database.benchmarking import benchmark_database, summarize, timed
+from libraries_database.filters import BookFilter
+from libraries_database.models import Book, BookAuthor, BookCategory
+from libraries_database.seeding import DatasetSize, seed_dataset
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large catalog and time the /books/ author, category and availability "
+        "filters: the EXISTS-based BookFilter against the join + DISTINCT it replaced. "
+        "The first page and the match count, the list view's two queries, are timed apart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000000)
+        parser.add_argument('--authors', type=int, default=20000)
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per scenario and variant.")
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Run against the configured database (already seeded) instead of a throwaway test database.",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(use_existing=options['use_existing_db']):
+            if not options['use_existing_db']:
+                seed_dataset(
+                    DatasetSize(
+                        books=options['books'], authors=options['authors'], categories=options['categories'],
+                        members=0, borrowings=0, reviews=0,
+                    ),
+                    log=self.stdout.write,
+                )
+            self.run(options['repeat'])
+
+    def scenarios(self):
+        def most_linked(through, column, n):
+            return list(
+                through.objects.values_list(column, flat=True).annotate(n=Count('pk')).order_by('-n')[:n]
+            )
+
+        authors = most_linked(BookAuthor, 'author_id', 3)
+        categories = most_linked(BookCategory, 'category_id', 3)
+        if len(authors) < 2 or len(categories) < 2:
+            raise CommandError("The catalog needs at least two linked authors and two linked categories.")
+        return {
+            'author': {'authors': [authors[0]]},
+            'three_authors': {'authors': authors},
+            'two_authors_all': {'authors__all': authors[:2]},
+            'author_category_available': {
+                'authors': [authors[0]], 'categories': [categories[0]], 'available_copies__gte': ['1'],
+            },
+            'categories_available': {'categories': categories, 'available_copies__gte': ['1']},
+            'two_categories_all': {'categories__all': categories[:2]},
+        }
+
+    @staticmethod
+    def exists_queryset(params):
+        data = QueryDict(mutable=True)
+        for key, values in params.items():
+            data.setlist(key, [str(value) for value in values])
+        filterset = BookFilter(data, queryset=Book.objects.order_by('pk'))
+        if not filterset.is_valid():
+            raise CommandError(str(filterset.errors))
+        return filterset.qs
+
+    @staticmethod
+    def distinct_queryset(params):
+        """The join + DISTINCT the filters used before, for any-of scenarios."""
+        queryset = Book.objects.order_by('pk')
+        if 'authors' in params:
+            queryset = queryset.filter(bookauthor__author_id__in=params['authors'])
+        if 'categories' in params:
+            queryset = queryset.filter(bookcategory__category_id__in=params['categories'])
+        if 'available_copies__gte' in params:
+            queryset = queryset.filter(available_copies__gte=int(params['available_copies__gte'][0]))
+        return queryset.distinct()
+
+    def run(self, repeat):
+        for name, params in self.scenarios().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name}: {params} =="))
+            variants = {'exists': self.exists_queryset}
+            if not any(key.endswith('__all') for key in params):
+                variants['join_distinct'] = self.distinct_queryset
+            for variant, make in variants.items():
+                queryset = make(params)
+                page, counts = [], []
+                for _ in range(repeat):
+                    with timed(page):
+                        list(queryset[:PAGE_SIZE])
+                    with timed(counts):
+                        count = queryset.count()
+                self.stdout.write(self.style.MIGRATE_LABEL(f"{variant} ({count} books)"))
+                self.stdout.write(f"  first page: {summarize(page)}")
+                self.stdout.write(f"  count: {summarize(counts)}")
+                for line in queryset[:PAGE_SIZE].explain().splitlines():
+                    self.stdout.write(f"    {line}")
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from libraries_database.benchmarking import benchmark_database, summarize, timed
+from libraries_database.models import Book, Borrowing, Library, Member
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer /books/borrow/ on a single hot title from several threads and report "
+        "throughput and whether any copy was oversold. SQLite serializes writers, so "
+        "contention shows up there as errors; use --use-existing-db against MySQL for real numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=50, help="Copies of the hot title.")
+        parser.add_argument('--members', type=int, default=200, help="Distinct borrowers.")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Run against the configured database instead of a throwaway test database.",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(use_existing=options['use_existing_db']):
+            self.run(options['copies'], options['members'], options['threads'])
+
+    def seed(self, copies, members):
+        library = Library.objects.create(
+            library_name="Benchmark Library",
+            campus_location="Benchmark",
+            contact_email=f"bench-{time.time_ns()}@example.com",
+            phone_number=str(time.time_ns())[-15:],
+        )
+        book = Book.objects.create(
+            title="Hot Title",
+            isbn=f"B{time.time_ns()}"[:20],
+            total_copies=copies,
+            available_copies=copies,
+            library=library,
+        )
+        prefix = time.time_ns()
+        Member.objects.bulk_create(
+            Member(
+                first_name="Bench",
+                last_name=str(i),
+                contact_email=f"bench-{prefix}-{i}@example.com",
+                phone_number="0000000000",
+            )
+            for i in range(members)
+        )
+        member_ids = list(
+            Member.objects.filter(contact_email__startswith=f"bench-{prefix}-").values_list('pk', flat=True)
+        )
+        return book, member_ids
+
+    def run(self, copies, members, threads):
+        book, member_ids = self.seed(copies, members)
+        url = reverse('book-borrow-book')
+        today = timezone.now().date()
+        payload = {
+            'book_id': book.pk,
+            'borrow_date': str(today),
+            'due_date': str(today + timezone.timedelta(days=14)),
+        }
+        outcomes = {'borrowed': 0, 'rejected': 0, 'errors': 0}
+        samples = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(ids):
+            client = Client()
+            local_samples, local = [], {'borrowed': 0, 'rejected': 0, 'errors': 0}
+            barrier.wait()
+            try:
+                for member_id in ids:
+                    try:
+                        with timed(local_samples):
+                            response = client.post(
+                                url, {**payload, 'member_id': member_id}, content_type='application/json'
+                            )
+                    except Exception:
+                        local['errors'] += 1
+                        continue
+                    if response.status_code == 200:
+                        local['borrowed'] += 1
+                    elif b'No copies available' in response.content:
+                        local['rejected'] += 1
+                    else:
+                        local['errors'] += 1
+            finally:
+                connection.close()
+            with lock:
+                samples.extend(local_samples)
+                for key, value in local.items():
+                    outcomes[key] += value
+
+        chunks = [member_ids[i::threads] for i in range(threads)]
+        workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        book.refresh_from_db()
+        created = Borrowing.objects.filter(book=book).count()
+        oversold = created > copies or book.available_copies != copies - created
+
+        self.stdout.write(f"threads={threads} copies={copies} attempts={len(member_ids)}")
+        self.stdout.write(
+            f"borrowed={outcomes['borrowed']} rejected={outcomes['rejected']} errors={outcomes['errors']}"
+        )
+        self.stdout.write(f"borrowings_created={created} available_copies={book.available_copies}")
+        self.stdout.write(f"throughput={len(samples) / elapsed:.1f} req/s latency={summarize(samples)}")
+        if oversold:
+            self.stdout.write(self.style.ERROR("OVERSOLD: counter and borrowings disagree."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No oversell."))
@@ -0,0 +1,225 @@
+import json
+import math
+import platform
+import subprocess
+import tracemalloc
+from dataclasses import fields
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from libraries_database import availability, caching
+from libraries_database.benchmarking import benchmark_database, summarize, timed
+from libraries_database.models import Book, Borrowing, Member
+from libraries_database.seeding import DatasetSize, seed_dataset
+
+# Pages cycled through by the list scenarios, when the table has that many.
+LIST_PAGES = 5
+
+SCENARIOS = ('book_list', 'book_detail', 'member_list', 'borrowing_list', 'statistics', 'borrow', 'return')
+
+# Summary keys compared by --compare; a slower or busier run is a regression.
+COMPARED = ('p50_ms', 'p95_ms', 'queries_max', 'peak_kib')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a dataset of the given size and drive the main endpoints in-process with "
+        "the test client, reporting latency percentiles, queries per request and peak "
+        "Python memory per scenario. --output writes the report as JSON; --compare "
+        "checks it against an earlier report and fails on regressions. --use-existing-db "
+        "skips the seeding; the borrow and return scenarios still write, so leave them "
+        "out of --scenarios on a database that matters."
+    )
+
+    def add_arguments(self, parser):
+        for field in fields(DatasetSize):
+            parser.add_argument(
+                f'--{field.name}', type=int, default=field.default,
+                help=f"{field.name.capitalize()} to seed (ignored with --use-existing-db)."
+            )
+        parser.add_argument('--requests', type=int, default=100, help="Requests per scenario; the first one is traced for memory and not timed.")
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument(
+            '--warm', action='store_true',
+            help="Keep the response cache between requests instead of clearing it before each one.",
+        )
+        parser.add_argument('--output', help="Write the JSON report to this path.")
+        parser.add_argument('--compare', help="Earlier JSON report to compare against.")
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help="Allowed relative increase before --compare reports a regression (default 0.2).",
+        )
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Run against the configured database, as already seeded, instead of a throwaway test database.",
+        )
+
+    def handle(self, *args, **options):
+        size = DatasetSize(**{field.name: options[field.name] for field in fields(DatasetSize)})
+        with benchmark_database(use_existing=options['use_existing_db']):
+            if options['use_existing_db']:
+                # Never write synthetic rows into a real database.
+                seeded = {'existing': True, 'rows': {
+                    model._meta.model_name: model.objects.count() for model in (Book, Member, Borrowing)
+                }}
+            else:
+                try:
+                    seeded = seed_dataset(size, log=self.stdout.write)
+                except ValueError as e:
+                    raise CommandError(str(e))
+            report = {
+                'meta': {
+                    'commit': _git_commit(),
+                    'created_at': timezone.now().isoformat(),
+                    'vendor': connection.vendor,
+                    'python': platform.python_version(),
+                    'requests': options['requests'],
+                    'warm': options['warm'],
+                },
+                'dataset': seeded,
+                'scenarios': self.run(options['scenarios'], options['requests'], options['warm']),
+            }
+
+        for name, result in report['scenarios'].items():
+            self.stdout.write(f"{name}: {result}")
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if options['compare']:
+            self.compare(report, options['compare'], options['threshold'])
+
+    def run(self, scenarios, requests, warm):
+        client = Client()
+        today = timezone.now().date()
+        book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+        member_ids = list(Member.objects.order_by('pk').values_list('pk', flat=True))
+        if not book_ids or not member_ids:
+            raise CommandError("The dataset needs at least one book and one member.")
+        active = set(Borrowing.objects.filter(return_date__isnull=True).values_list('member_id', 'book_id'))
+        # Member/book pairs without an open borrowing; the borrow scenario
+        # checks them out and the return scenario brings them back.
+        free_pairs = (
+            (member_ids[i % len(member_ids)], book_ids[(i * 7) % len(book_ids)]) for i in range(len(member_ids) * 2)
+        )
+        free_pairs = [pair for pair in free_pairs if pair not in active][:requests]
+        opened, to_return = [], []
+
+        def list_page(name, model):
+            # Only ask for pages that exist; a 404 would be timed as a request.
+            pages = min(LIST_PAGES, max(1, math.ceil(model.objects.count() / api_settings.PAGE_SIZE)))
+            return lambda i: client.get(reverse(name), {'page': i % pages + 1})
+
+        def book_detail(i):
+            return client.get(reverse('book-detail', args=[book_ids[i % len(book_ids)]]))
+
+        def borrow(i):
+            member_id, book_id = free_pairs[i % len(free_pairs)]
+            response = client.post(reverse('book-borrow-book'), {
+                'book_id': book_id,
+                'member_id': member_id,
+                'borrow_date': str(today),
+                'due_date': str(today + timezone.timedelta(days=14)),
+            }, content_type='application/json')
+            if response.status_code == 200:
+                opened.append((member_id, book_id))
+            return response
+
+        def return_(i):
+            return client.post(
+                reverse('book-return-book'), {'borrowing_id': to_return[i]}, content_type='application/json'
+            )
+
+        handlers = {
+            'book_list': list_page('book-list', Book),
+            'book_detail': book_detail,
+            'member_list': list_page('member-list', Member),
+            'borrowing_list': list_page('borrowing-list', Borrowing),
+            'statistics': lambda i: client.get(reverse('library-statistics')),
+            'borrow': borrow,
+            'return': return_,
+        }
+
+        results = {}
+        for name in scenarios:
+            if name == 'return':
+                # Look the borrowings up outside the measured requests.
+                open_ids = {
+                    (member_id, book_id): pk
+                    for pk, member_id, book_id in Borrowing.objects.filter(
+                        member_id__in={member_id for member_id, _ in opened}, return_date__isnull=True
+                    ).values_list('pk', 'member_id', 'book_id')
+                }
+                to_return = [open_ids[pair] for pair in opened]
+                opened.clear()
+            # Return can only bring back what borrow checked out earlier in the run.
+            count = min(requests, {'borrow': len(free_pairs), 'return': len(to_return)}.get(name, requests))
+            samples, queries, statuses = [], [], {}
+            peak = 0
+            for i in range(count):
+                if not warm:
+                    caching.get_cache().clear()
+                    availability.clear()
+                if i == 0:
+                    # The first request is traced for peak memory and left out
+                    # of the timings, since tracemalloc slows everything down.
+                    tracemalloc.start()
+                    try:
+                        response = handlers[name](i)
+                        _, peak = tracemalloc.get_traced_memory()
+                    finally:
+                        tracemalloc.stop()
+                else:
+                    with CaptureQueriesContext(connection) as ctx:
+                        with timed(samples):
+                            response = handlers[name](i)
+                    queries.append(len(ctx.captured_queries))
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            results[name] = {
+                **summarize(samples),
+                'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'queries_max': max(queries, default=None),
+                'peak_kib': round(peak / 1024, 1),
+                'statuses': {str(code): n for code, n in sorted(statuses.items())},
+            }
+        return results
+
+    def compare(self, report, path, threshold):
+        with open(path) as handle:
+            baseline = json.load(handle)
+        regressions = []
+        for name, result in report['scenarios'].items():
+            before = baseline.get('scenarios', {}).get(name)
+            if not before:
+                continue
+            for key in COMPARED:
+                old, new = before.get(key), result.get(key)
+                if old is None or new is None:
+                    continue
+                change = (new - old) / old if old else (1.0 if new else 0.0)
+                line = f"{name}.{key}: {old} -> {new} ({change:+.0%})"
+                if change > threshold:
+                    regressions.append(line)
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regression(s) over {threshold:.0%} against {baseline['meta'].get('commit')}."
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions."))
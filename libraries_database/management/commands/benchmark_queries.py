@@ -0,0 +1,184 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Avg
+from django.utils import timezone
+
+from libraries_database.benchmarking import benchmark_database, summarize, timed
+from libraries_database.models import Book, Borrowing, Library, Member, Review, open_borrowing_indexes
+
+# (model, index name) pairs added for the circulation hot paths.
+HOT_INDEXES = [
+    (Book, 'book_title_idx'),
+    (Borrowing, 'borrowing_member_open_idx'),
+    (Borrowing, 'borrowing_open_due_idx'),
+    (Review, 'review_book_rating_idx'),
+]
+
+
+def hot_index(model, name):
+    # The open-borrowing indexes are not in Borrowing.Meta; their shape depends on the backend.
+    indexes = open_borrowing_indexes(connection) if model is Borrowing else model._meta.indexes
+    return next(index for index in indexes if index.name == name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large catalog and print EXPLAIN output plus p50/p99 timings for the "
+        "circulation hot queries, first without and then with the hot-path indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=5000)
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--borrowings', type=int, default=200000)
+        parser.add_argument('--reviews', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=50, help="Runs per query and phase.")
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Run against the configured database (already seeded) instead of a throwaway test database.",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(use_existing=options['use_existing_db']):
+            if not options['use_existing_db']:
+                self.seed(options['members'], options['books'], options['borrowings'], options['reviews'])
+            self.run(options['repeat'])
+
+    # -------------------------
+    # SEEDING
+    # -------------------------
+    def seed(self, members, books, borrowings, reviews):
+        start = time.perf_counter()
+        prefix = time.time_ns()
+        today = timezone.now().date()
+        library = Library.objects.create(
+            library_name="Benchmark Library",
+            campus_location="Benchmark",
+            contact_email=f"bench-{prefix}@example.com",
+            phone_number=str(prefix)[-15:],
+        )
+        Member.objects.bulk_create(
+            (
+                Member(
+                    first_name="Bench",
+                    last_name=str(i),
+                    contact_email=f"bench-{prefix}-{i}@example.com",
+                    phone_number="0000000000",
+                )
+                for i in range(members)
+            ),
+            batch_size=5000,
+        )
+        Book.objects.bulk_create(
+            (
+                Book(
+                    title=f"Benchmark Title {i:07d}",
+                    isbn=f"Q{prefix}{i}"[-20:],
+                    total_copies=5,
+                    available_copies=5,
+                    library=library,
+                )
+                for i in range(books)
+            ),
+            batch_size=5000,
+        )
+        member_ids = list(
+            Member.objects.filter(contact_email__startswith=f"bench-{prefix}-").order_by('pk').values_list('pk', flat=True)
+        )
+        book_ids = list(Book.objects.filter(library=library).order_by('pk').values_list('pk', flat=True))
+
+        def pair(i):
+            # Distinct (member, book) pairs for every i below members * books.
+            return member_ids[i % members], book_ids[(i // members) % books]
+
+        def borrowing(i):
+            member_id, book_id = pair(i)
+            borrow_date = today - timezone.timedelta(days=i % 90)
+            due_date = borrow_date + timezone.timedelta(days=14)
+            returned = i % 10 != 0
+            return Borrowing(
+                member_id=member_id,
+                book_id=book_id,
+                borrow_date=borrow_date,
+                due_date=due_date,
+                return_date=min(due_date, today) if returned else None,
+            )
+
+        Borrowing.objects.bulk_create((borrowing(i) for i in range(borrowings)), batch_size=5000)
+        Review.objects.bulk_create(
+            (
+                Review(
+                    member_id=pair(i)[0],
+                    book_id=pair(i)[1],
+                    rating=i % 5 + 1,
+                    comment="",
+                    review_date=today,
+                )
+                for i in range(reviews)
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f"Seeded {members} members, {books} books, {borrowings} borrowings and {reviews} reviews "
+            f"in {time.perf_counter() - start:.1f}s."
+        )
+
+    # -------------------------
+    # QUERIES
+    # -------------------------
+    def hot_queries(self):
+        today = timezone.now().date()
+        member_ids = list(Member.objects.values_list('pk', flat=True)[:1000])
+        book_ids = list(Book.objects.values_list('pk', flat=True)[:1000])
+        return {
+            'active_borrowings': lambda: Borrowing.objects.filter(
+                member_id=random.choice(member_ids), return_date__isnull=True
+            ),
+            'has_overdue': lambda: Member.objects.filter(
+                pk__in=random.sample(member_ids, min(10, len(member_ids)))
+            ).with_has_overdue(),
+            'overdue_sweep': lambda: Borrowing.objects.filter(
+                return_date__isnull=True, due_date__lt=today
+            ).values('pk')[:500],
+            'average_rating': lambda: Review.objects.filter(
+                book_id=random.choice(book_ids)
+            ).values('book').annotate(average=Avg('rating')),
+            'title_icontains': lambda: Book.objects.filter(title__icontains='title 00001')[:20],
+            'title_istartswith': lambda: Book.objects.filter(title__istartswith='benchmark title 00001')[:20],
+        }
+
+    def measure(self, phase, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"== {phase} =="))
+        for name, make in self.hot_queries().items():
+            samples = []
+            for _ in range(repeat):
+                queryset = make()
+                with timed(samples):
+                    list(queryset)
+            self.stdout.write(self.style.MIGRATE_LABEL(f"{name}: {summarize(samples)}"))
+            for line in make().explain().splitlines():
+                self.stdout.write(f"    {line}")
+
+    def set_indexes(self, present):
+        with connection.schema_editor() as editor:
+            for model, name in HOT_INDEXES:
+                with connection.cursor() as cursor:
+                    exists = name in connection.introspection.get_constraints(cursor, model._meta.db_table)
+                if exists == present:
+                    continue
+                index = hot_index(model, name)
+                if present:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+
+    def run(self, repeat):
+        self.set_indexes(present=False)
+        try:
+            self.measure('without hot-path indexes', repeat)
+        finally:
+            self.set_indexes(present=True)
+        self.measure('with hot-path indexes', repeat)
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from libraries_database import importers
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or NDJSON catalog file into Book/Author/Category in bulk chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--format', choices=importers.FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or importers.detect_format(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+
+        if path == '-':
+            report = importers.import_books(
+                importers.read_rows(sys.stdin.buffer, fmt), chunk_size=options['chunk_size']
+            )
+        else:
+            with open(path, 'rb') as stream:
+                report = importers.import_books(
+                    importers.read_rows(stream, fmt), chunk_size=options['chunk_size']
+                )
+
+        summary = report.as_dict()
+        for error in summary['errors']:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['rows']} rows: {summary['created']} created, {summary['duplicates']} duplicates, "
+            f"{summary['invalid']} invalid in {summary['seconds']}s ({summary['rows_per_sec']} rows/sec)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from libraries_database.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized rating_sum/rating_count columns on Book from reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} books."))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from libraries_database import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Refill the book search index from every book. Creates the FTS5/FULLTEXT table first "
+        "when the database supports one, so it also switches an existing install onto it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        index = search.install(options['database'])
+        indexed = search.rebuild_index(using=options['database'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} books into {type(index).__name__} in {time.perf_counter() - start:.2f}s."
+        ))
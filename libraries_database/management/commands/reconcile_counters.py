@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from libraries_database import counters
+
+
+class Command(BaseCommand):
+    help = "Recount the /statistics/ counters from the base tables and fix any drift."
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile()
+        for key, (old, new) in sorted(drift.items()):
+            self.stdout.write(f"{key}: {old} -> {new}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled counters; {len(drift)} corrected."))
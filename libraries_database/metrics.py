@@ -0,0 +1,204 @@
+"""
+Prometheus text exposition for /api/v1/metrics/.
+
+Each worker process keeps its request histograms (instrumentation.py) and
+response-cache counts (caching.py) in memory. At most every
+``METRICS_FLUSH_INTERVAL`` seconds it writes them to ``<METRICS_DIR>/<pid>.json``.
+A scrape adds the files of every other process to its own live numbers, so any
+worker can answer for all of them. Files of exited workers are kept so their
+counters do not go backwards; clear the directory when deploying. With
+``METRICS_DIR`` unset, only the answering process is reported.
+
+Domain gauges are read from the maintained StatisticCounter rows with one
+primary-key lookup. Nothing here runs a COUNT(*).
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from . import caching, counters, instrumentation
+from .models import StatisticCounter
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+DOMAIN_GAUGES = (
+    ('library_books', counters.BOOKS, "Books in the catalog."),
+    ('library_members', counters.MEMBERS, "Registered members."),
+    ('library_borrowings', counters.BORROWINGS, "Borrowings ever recorded."),
+    ('library_active_borrowings', counters.ACTIVE_BORROWINGS, "Borrowings not yet returned."),
+    (
+        'library_overdue_borrowings', counters.OVERDUE_BORROWINGS,
+        "Unreturned borrowings past due, as of the last accrue_late_fees run.",
+    ),
+)
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def process_snapshot():
+    return {
+        'pid': os.getpid(),
+        'buckets': list(instrumentation.LATENCY_BUCKETS_MS),
+        'routes': instrumentation.route_histograms(),
+        'cache': caching.cache_stats(),
+        'connections_opened': instrumentation.connections_opened(),
+    }
+
+
+def flush(force=False):
+    """Write this process's snapshot to the metrics directory if it is due."""
+    global _last_flush
+    directory = _metrics_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+    if not force and now - _last_flush < interval:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        snapshot = process_snapshot()
+        # Write then rename so a concurrent scrape never reads half a file.
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(snapshot, handle)
+        os.replace(temp_path, os.path.join(directory, f"{snapshot['pid']}.json"))
+    finally:
+        _flush_lock.release()
+
+
+def _other_snapshots():
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return []
+    own = f"{os.getpid()}.json"
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json') or name.startswith('.') or name == own:
+            continue
+        try:
+            with open(os.path.join(directory, name)) as handle:
+                snapshots.append(json.load(handle))
+        except (OSError, ValueError):
+            continue  # Removed or being replaced mid-scrape.
+    return snapshots
+
+
+def collect():
+    """Sum the live snapshot of this process with the flushed ones of the others."""
+    snapshots = [process_snapshot(), *_other_snapshots()]
+    buckets = list(instrumentation.LATENCY_BUCKETS_MS)
+    routes, cache, connections_opened = {}, {}, 0
+    for snapshot in snapshots:
+        if snapshot.get('buckets') != buckets:
+            continue  # Written by a build with different bucket bounds.
+        for route, values in snapshot['routes'].items():
+            total = routes.setdefault(route, {
+                'count': 0, 'total_ms': 0.0, 'db_ms': 0.0, 'queries': 0, 'buckets': [0] * (len(buckets) + 1),
+            })
+            for key in ('count', 'total_ms', 'db_ms', 'queries'):
+                total[key] += values[key]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], values['buckets'])]
+        for name, values in snapshot['cache'].items():
+            total = cache.setdefault(name, {'hits': 0, 'misses': 0})
+            total['hits'] += values['hits']
+            total['misses'] += values['misses']
+        connections_opened += snapshot['connections_opened']
+    return {
+        'processes': len(snapshots),
+        'routes': routes,
+        'cache': cache,
+        'connections_opened': connections_opened,
+    }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Exposition:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, **labels):
+        if labels:
+            rendered = ','.join(f'{key}="{_label(label)}"' for key, label in labels.items())
+            name = f"{name}{{{rendered}}}"
+        self.lines.append(f"{name} {_number(value)}")
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def render():
+    """All metrics in the Prometheus text format."""
+    flush()
+    data = collect()
+    out = _Exposition()
+    routes = sorted(data['routes'].items())
+    bounds = instrumentation.LATENCY_BUCKETS_MS
+
+    out.family('library_metrics_processes', 'gauge', "Worker processes whose metrics are included.")
+    out.sample('library_metrics_processes', data['processes'])
+
+    out.family('library_http_requests_total', 'counter', "Requests handled, by resolved URL name.")
+    for route, values in routes:
+        out.sample('library_http_requests_total', values['count'], route=route)
+
+    out.family('library_http_request_duration_seconds', 'histogram', "Request latency, by resolved URL name.")
+    for route, values in routes:
+        cumulative = 0
+        for bound, count in zip(bounds, values['buckets']):
+            cumulative += count
+            out.sample('library_http_request_duration_seconds_bucket', cumulative, route=route, le=bound / 1000)
+        out.sample('library_http_request_duration_seconds_bucket', values['count'], route=route, le='+Inf')
+        out.sample('library_http_request_duration_seconds_sum', values['total_ms'] / 1000, route=route)
+        out.sample('library_http_request_duration_seconds_count', values['count'], route=route)
+
+    out.family('library_db_queries_total', 'counter', "SQL queries run while handling requests.")
+    for route, values in routes:
+        out.sample('library_db_queries_total', values['queries'], route=route)
+
+    out.family('library_db_query_duration_seconds_total', 'counter', "Time spent in SQL while handling requests.")
+    for route, values in routes:
+        out.sample('library_db_query_duration_seconds_total', values['db_ms'] / 1000, route=route)
+
+    out.family(
+        'library_db_connections_opened_total', 'counter',
+        "New database connections. Compare with library_http_requests_total for the reuse rate.",
+    )
+    out.sample('library_db_connections_opened_total', data['connections_opened'])
+
+    out.family('library_response_cache_requests_total', 'counter', "Response cache lookups, by viewset and result.")
+    for name, values in sorted(data['cache'].items()):
+        out.sample('library_response_cache_requests_total', values['hits'], viewset=name, result='hit')
+        out.sample('library_response_cache_requests_total', values['misses'], viewset=name, result='miss')
+
+    values = dict(
+        StatisticCounter.objects.filter(key__in=[key for _, key, _ in DOMAIN_GAUGES]).values_list('key', 'value')
+    )
+    for name, key, help_text in DOMAIN_GAUGES:
+        if key in values:
+            out.family(name, 'gauge', help_text)
+            out.sample(name, values[key])
+    return out.text()
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:22
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model('libraries_database', 'Book')
+    Review = apps.get_model('libraries_database', 'Review')
+    totals = Review.objects.values('book_id').annotate(rating_sum=Sum('rating'), rating_count=Count('pk'))
+    for row in totals.iterator():
+        Book.objects.filter(pk=row['book_id']).update(
+            rating_sum=row['rating_sum'], rating_count=row['rating_count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries_database', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
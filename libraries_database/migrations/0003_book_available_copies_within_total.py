@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:26
+
+from django.db import migrations, models
+
+
+def clamp_available_copies(apps, schema_editor):
+    Book = apps.get_model('libraries_database', 'Book')
+    Book.objects.filter(available_copies__gt=models.F('total_copies')).update(
+        available_copies=models.F('total_copies')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries_database', '0002_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_available_copies, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__gte', 0), ('available_copies__lte', models.F('total_copies'))), name='available_copies_within_total'),
+        ),
+    ]
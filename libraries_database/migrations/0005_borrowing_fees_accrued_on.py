@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries_database', '0004_statisticcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowing',
+            name='fees_accrued_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-17 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_search_index(apps, schema_editor):
+    from libraries_database import search
+
+    search.install(schema_editor.connection.alias)
+    search.rebuild_index(apps, using=schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    from libraries_database import search
+
+    for index in search.FULLTEXT_INDEXES:
+        if index.is_supported(schema_editor.connection):
+            index.uninstall(schema_editor.connection)
+    search.reset()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries_database', '0006_circulation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libraries_database.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'book'], name='search_token_idx')],
+                'constraints': [models.UniqueConstraint(fields=('book', 'token'), name='unique_book_search_token')],
+            },
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
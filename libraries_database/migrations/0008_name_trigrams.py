@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_name_trigrams(apps, schema_editor):
+    from libraries_database import fuzzy
+
+    for model_name in fuzzy.TABLES:
+        fuzzy.rebuild(apps.get_model('libraries_database', model_name), apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries_database', '0007_book_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('name_trigrams', models.PositiveSmallIntegerField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libraries_database.author')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'author'], name='author_trigram_idx')],
+                'constraints': [models.UniqueConstraint(fields=('author', 'trigram'), name='unique_author_name_trigram')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MemberNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('name_trigrams', models.PositiveSmallIntegerField()),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='libraries_database.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'member'], name='member_trigram_idx')],
+                'constraints': [models.UniqueConstraint(fields=('member', 'trigram'), name='unique_member_name_trigram')],
+            },
+        ),
+        migrations.RunPython(build_name_trigrams, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,9 @@
+from django.conf import settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import Avg
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
 
 
 # ===================== Library =====================
@@ -30,13 +31,46 @@ class Book(models.Model):
     library = models.ForeignKey('Library', on_delete=models.CASCADE)
     authors = models.ManyToManyField('Author', through='BookAuthor')
     categories = models.ManyToManyField('Category', through='BookCategory')
+    # Denormalized review aggregates, kept in step by the Review signals in
+    # signals.py and rebuilt by ratings.rebuild_rating_aggregates.
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(available_copies__gte=0) & models.Q(available_copies__lte=models.F('total_copies')),
+                name='available_copies_within_total'
+            )
+        ]
+        indexes = [
+            # Ordering and prefix matches on title; substring search cannot
+            # use a B-tree and is handled separately.
+            models.Index(fields=['title'], name='book_title_idx'),
+        ]
+
+    # Written only by the Review signals and rebuild_rating_aggregates.
+    AGGREGATE_FIELDS = ('rating_sum', 'rating_count')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.pk is not None and not kwargs.get('force_insert'):
+            # An instance loaded before a review was written holds stale
+            # aggregates; never write them back over the signal's UPDATE.
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields if not field.primary_key
+                ]
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.AGGREGATE_FIELDS]
+        # Keep the row write and the statistics counter update together.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def average_rating(self):
-        avg = self.reviews.aggregate(Avg('rating'))['rating__avg']
-        if avg is not None:
-            return round(avg, 2)
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 2)
         return None
 
     def clean(self):
@@ -78,6 +112,22 @@ class Category(models.Model):
 
 
 # ===================== Member =====================
+class MemberQuerySet(models.QuerySet):
+    def _overdue_borrowings(self):
+        today = timezone.now().date()
+        return Borrowing.objects.filter(
+            member=OuterRef('pk'), due_date__lt=today, return_date__isnull=True
+        )
+
+    def with_has_overdue(self):
+        """Annotate ``has_overdue`` with one correlated EXISTS instead of a query per member."""
+        return self.annotate(has_overdue=Exists(self._overdue_borrowings()))
+
+    def filter_has_overdue(self, value=True):
+        overdue = Exists(self._overdue_borrowings())
+        return self.filter(overdue if value else ~overdue)
+
+
 class Member(models.Model):
     class MemberType(models.TextChoices):
         STUDENT = 'student', 'Student'
@@ -96,6 +146,13 @@ class Member(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MemberQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Keep the row write and the statistics counter update together.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def has_overdue_books(self):
         today = timezone.now().date()
         return (
@@ -108,6 +165,14 @@ class Member(models.Model):
 
 
 # ===================== Borrowing =====================
+LATE_FEE_PER_DAY = 5
+
+
+def late_fee_rate(member_type):
+    """Daily late fee for a member type; ``settings.LATE_FEE_RATES`` overrides the default."""
+    return getattr(settings, 'LATE_FEE_RATES', {}).get(member_type, LATE_FEE_PER_DAY)
+
+
 class Borrowing(models.Model):
     borrowing_id = models.AutoField(primary_key=True)
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
@@ -116,6 +181,8 @@ class Borrowing(models.Model):
     due_date = models.DateField()
     return_date = models.DateField(null=True, blank=True)
     late_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Date the accrue_late_fees job last brought late_fee up to date.
+    fees_accrued_on = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -127,6 +194,8 @@ class Borrowing(models.Model):
                 name='unique_active_borrowing_per_member_book'
             )
         ]
+        # The open-borrowing indexes depend on the backend, so migrations
+        # 0006 and 0009 create them rather than Meta; see open_borrowing_indexes().
 
     def clean(self):
         if self.borrow_date > timezone.now().date():
@@ -148,14 +217,45 @@ class Borrowing(models.Model):
         ).exclude(pk=self.pk).exists():
             raise ValidationError("This member already has this book borrowed and not returned.")
 
+    def calculate_late_fee(self, return_date, member_type=None):
+        if return_date > self.due_date:
+            if member_type is None:
+                member_type = self.member.member_type
+            return (return_date - self.due_date).days * late_fee_rate(member_type)
+        return 0
+
     def save(self, *args, **kwargs):
         self.full_clean()  # Always run validation
-        super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Borrowing {self.borrowing_id} by {self.member}"
 
 
+def open_borrowing_indexes(connection):
+    """
+    The indexes on open borrowings (``return_date IS NULL``) for ``connection``.
+
+    Partial where the backend supports it, so only books still out are
+    indexed. MySQL has none, and Django would silently drop the condition
+    (system check models.W037), so there they are plain composites whose
+    return_date column serves the IS NULL filter instead.
+    """
+    if connection.features.supports_partial_indexes:
+        open_only = models.Q(return_date__isnull=True)
+        return [
+            # Member.active_borrowings and has_overdue.
+            models.Index(fields=['member', 'due_date'], condition=open_only, name='borrowing_member_open_idx'),
+            # Overdue sweeps: has_overdue filters and the accrue_late_fees job.
+            models.Index(fields=['return_date', 'due_date'], condition=open_only, name='borrowing_open_due_idx'),
+        ]
+    return [
+        models.Index(fields=['member', 'return_date', 'due_date'], name='borrowing_member_open_idx'),
+        models.Index(fields=['return_date', 'due_date'], name='borrowing_open_due_idx'),
+    ]
+
+
 # ===================== Review =====================
 class Review(models.Model):
     review_id = models.AutoField(primary_key=True)
@@ -173,12 +273,21 @@ class Review(models.Model):
             ),
             models.UniqueConstraint(fields=['member', 'book'], name='unique_member_book')
         ]
+        indexes = [
+            # Covers the per-book rating sums without touching the table.
+            models.Index(fields=['book', 'rating'], name='review_book_rating_idx'),
+        ]
 
     comment = models.TextField()
     review_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        # Keep the row write and the Book rating aggregate update together.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Review {self.review_id} for {self.book}"
 
@@ -205,3 +314,89 @@ class BookCategory(models.Model):
 
     def __str__(self):
         return f"{self.book.title} - {self.category.category}"
+
+
+# ===================== StatisticCounter =====================
+class StatisticCounter(models.Model):
+    """
+    A maintained total such as ``books`` or ``active_borrowings:library:3``.
+
+    Kept in step by counters.py so /statistics/ never has to COUNT(*) the
+    large tables.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+# ===================== BookSearchToken =====================
+class BookSearchToken(models.Model):
+    """
+    One normalized word of a book's title, author names or category names.
+
+    The portable inverted index behind ``?search=`` (search.TokenIndex), used
+    on databases without FTS5 or FULLTEXT support. ``weight`` sums the field
+    weights of every place the word occurs in the book.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    token = models.CharField(max_length=50)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also serves the per-book rank lookup.
+            models.UniqueConstraint(fields=['book', 'token'], name='unique_book_search_token'),
+        ]
+        indexes = [
+            # Prefix range scans for a query term.
+            models.Index(fields=['token', 'book'], name='search_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.book_id}"
+
+
+# ===================== Name trigrams =====================
+class NameTrigram(models.Model):
+    """
+    One trigram of a person's normalized full name, behind ``?name_fuzzy=``
+    (fuzzy.py). ``name_trigrams`` repeats the name's trigram count on every
+    row so similarity can be ranked from this table alone.
+    """
+    trigram = models.CharField(max_length=3)
+    name_trigrams = models.PositiveSmallIntegerField()
+
+    class Meta:
+        abstract = True
+
+
+class AuthorNameTrigram(NameTrigram):
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'trigram'], name='unique_author_name_trigram'),
+        ]
+        indexes = [
+            models.Index(fields=['trigram', 'author'], name='author_trigram_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.author_id}"
+
+
+class MemberNameTrigram(NameTrigram):
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'trigram'], name='unique_member_name_trigram'),
+        ]
+        indexes = [
+            models.Index(fields=['trigram', 'member'], name='member_trigram_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.member_id}"
@@ -1,6 +1,263 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder without its millisecond rounding.
+
+    Cursor values are seeked from exactly, so datetimes and times keep their
+    microseconds; rows written in the same millisecond would otherwise repeat
+    or go missing between pages.
+    """
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
 
 class CustomPagination(PageNumberPagination):
     page_size = 2
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on ``(ordering fields..., pk)``.
+
+    Each page is fetched with a ``WHERE (ordering) > (last row)`` predicate
+    instead of ``OFFSET``, and no ``COUNT(*)`` is run, so page 10,000 costs the
+    same as page 1. The ordering is whatever the queryset carries after
+    ``OrderingFilter`` ran; cursors are opaque and remember the ordering they
+    were issued for, so a cursor replayed against a different ``?ordering=`` is
+    rejected rather than silently skipping rows. NULLs sort lowest.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.keys = self.get_keys(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if cursor is not None:
+            queryset = queryset.filter(self.get_seek_filter(cursor['values'], reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.has_next = self.has_next and bool(rows)
+        self.has_previous = self.has_previous and bool(rows)
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    # -------------------------
+    # Ordering keys
+    # -------------------------
+    def get_keys(self, queryset):
+        """Return ``[(attname, field, descending), ...]`` ending with the primary key."""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        pk = queryset.model._meta.pk
+        keys = []
+        for name in ordering:
+            if not isinstance(name, str):
+                raise NotFound('Keyset pagination only supports plain field orderings.')
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            attname, field = self._resolve(queryset, name)
+            keys.append((attname, field, descending))
+            if attname == pk.attname:
+                return keys
+        descending = keys[0][2] if keys else False
+        keys.append((pk.attname, pk, descending))
+        return keys
+
+    def _resolve(self, queryset, name):
+        if name == 'pk':
+            name = queryset.model._meta.pk.name
+        if name in queryset.query.annotations:
+            return name, queryset.query.annotations[name].output_field
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise NotFound(f"Cannot paginate on '{name}'.")
+        if not field.concrete:
+            raise NotFound(f"Cannot paginate on '{name}'.")
+        return field.attname, field
+
+    def get_order_by(self, reverse=False):
+        order_by = []
+        for attname, field, descending in self.keys:
+            descending = descending != reverse
+            if not field.null:
+                order_by.append(f"-{attname}" if descending else attname)
+            elif descending:
+                order_by.append(F(attname).desc(nulls_last=True))
+            else:
+                order_by.append(F(attname).asc(nulls_first=True))
+        return order_by
+
+    def get_seek_filter(self, values, reverse=False):
+        """Build ``(k1, k2, ...) > (v1, v2, ...)`` in the current sort direction."""
+        seek = Q(pk__in=[])
+        equal = Q()
+        for (attname, field, descending), value in zip(self.keys, values):
+            descending = descending != reverse
+            if value is None:
+                after = None if descending else Q(**{f"{attname}__isnull": False})
+                same = Q(**{f"{attname}__isnull": True})
+            else:
+                after = Q(**{f"{attname}__lt" if descending else f"{attname}__gt": value})
+                if descending and field.null:
+                    after |= Q(**{f"{attname}__isnull": True})
+                same = Q(**{attname: value})
+            if after is not None:
+                seek |= equal & after
+            equal &= same
+        return seek
+
+    # -------------------------
+    # Cursors
+    # -------------------------
+    def _ordering_signature(self):
+        return [f"-{attname}" if descending else attname for attname, _, descending in self.keys]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if payload['o'] != self._ordering_signature() or len(payload['v']) != len(self.keys):
+                raise ValueError
+            values = [
+                None if value is None else field.to_python(value)
+                for (_, field, _), value in zip(self.keys, payload['v'])
+            ]
+            return {'values': values, 'reverse': bool(payload['r'])}
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        payload = {
+            'o': self._ordering_signature(),
+            'v': [getattr(row, attname) for attname, _, _ in self.keys],
+            'r': reverse,
+        }
+        data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(remove_query_param(url, 'page'), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque keyset cursor. Pass an empty value to start at the first page.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """
+    Page numbers, exactly as the default PageNumberPagination serves them,
+    unless the client sends ``?cursor=``; ``?page_size=`` applies to keyset
+    pages only.
+
+    Set as ``pagination_class`` on viewsets over large tables. They can opt in
+    permanently with ``pagination_class = KeysetPagination`` instead.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            super().get_schema_operation_parameters(view)
+            + self.keyset_class().get_schema_operation_parameters(view)[:1]
+        )
@@ -0,0 +1,349 @@
+"""
+Inverted index behind ``?search=`` on /books/.
+
+Each book is indexed as one document with three fields: its title, its
+author names and its category names. There are three interchangeable
+stores:
+
+* ``SQLiteFTSIndex``: an FTS5 virtual table, ranked with ``bm25()``.
+* ``MySQLFullTextIndex``: a side table with a FULLTEXT index, ranked with
+  ``MATCH ... AGAINST``.
+* ``TokenIndex``: the BookSearchToken table, one row per (book, word), ranked
+  by summed field weights. Used everywhere else.
+
+Migration 0007 creates the FTS5 or FULLTEXT table where the database
+supports it and fills it. ``get_index()`` uses that table when it exists and
+falls back to the token table otherwise. Signals in signals.py, the book
+serializer and the importer keep the active index current.
+``rebuild_search_index`` refills it from scratch.
+
+Query terms match words by prefix, and every term has to match somewhere
+in the document. Matching books carry a ``search_rank`` annotation; higher
+is more relevant.
+"""
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import FloatField, OuterRef, Q, Subquery, Sum
+
+MAX_TERMS = 10
+TOKEN_LENGTH = 50
+CHUNK_SIZE = 2000
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercased words of ``text`` with accents stripped."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return [word[:TOKEN_LENGTH] for word in _WORD.findall(text)]
+
+
+def parse_query(query):
+    """Distinct search terms of ``query``, in order, at most MAX_TERMS."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+
+
+def documents(book_ids, apps=global_apps, using=DEFAULT_DB_ALIAS):
+    """``[(book_id, title, authors, categories)]`` for ``book_ids``, in three queries on ``using``."""
+    Book = apps.get_model('libraries_database', 'Book')
+    BookAuthor = apps.get_model('libraries_database', 'BookAuthor')
+    BookCategory = apps.get_model('libraries_database', 'BookCategory')
+
+    titles = dict(Book.objects.using(using).filter(pk__in=book_ids).values_list('pk', 'title'))
+    authors, categories = defaultdict(list), defaultdict(list)
+    for book_id, first_name, last_name in BookAuthor.objects.using(using).filter(book_id__in=titles).values_list(
+        'book_id', 'author__first_name', 'author__last_name'
+    ):
+        authors[book_id].append(f"{first_name} {last_name}")
+    for book_id, name in BookCategory.objects.using(using).filter(book_id__in=titles).values_list(
+        'book_id', 'category__category'
+    ):
+        categories[book_id].append(name)
+    return [
+        (book_id, title, ' '.join(authors[book_id]), ' '.join(categories[book_id]))
+        for book_id, title in titles.items()
+    ]
+
+
+def _book_pk_column(queryset):
+    opts = queryset.model._meta
+    return f"{opts.db_table}.{opts.pk.column}"
+
+
+class TokenIndex:
+    """Portable index in the BookSearchToken table."""
+    vendor = None
+    # Title, author and category words, in document field order.
+    weights = (3, 2, 1)
+
+    def _table(self, apps):
+        return apps.get_model('libraries_database', 'BookSearchToken')
+
+    def install(self, connection):
+        pass  # The table is an ordinary model.
+
+    def uninstall(self, connection):
+        pass
+
+    def delete(self, connection, book_ids, apps=global_apps):
+        table = connection.ops.quote_name(self._table(apps)._meta.db_table)
+        with connection.cursor() as cursor:
+            for start in range(0, len(book_ids), CHUNK_SIZE):
+                chunk = book_ids[start:start + CHUNK_SIZE]
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE book_id IN ({', '.join(['%s'] * len(chunk))})", chunk
+                )
+
+    def write(self, connection, docs, apps=global_apps):
+        BookSearchToken = self._table(apps)
+        self.delete(connection, [doc[0] for doc in docs], apps)
+        rows = []
+        for book_id, *fields in docs:
+            weights = defaultdict(int)
+            for text, weight in zip(fields, self.weights):
+                for token in tokenize(text):
+                    weights[token] += weight
+            rows.extend(
+                BookSearchToken(book_id=book_id, token=token, weight=min(weight, 32767))
+                for token, weight in weights.items()
+            )
+        BookSearchToken.objects.using(connection.alias).bulk_create(rows, batch_size=CHUNK_SIZE)
+
+    def clear(self, connection, apps=global_apps):
+        table = connection.ops.quote_name(self._table(apps)._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+
+    @staticmethod
+    def _prefix(term):
+        # A range rather than LIKE 'term%', so a plain B-tree on token serves
+        # it under any collation.
+        return Q(token__gte=term, token__lt=term[:-1] + chr(ord(term[-1]) + 1))
+
+    def filter(self, queryset, terms):
+        BookSearchToken = self._table(global_apps)
+        for term in terms:
+            queryset = queryset.filter(pk__in=BookSearchToken.objects.filter(self._prefix(term)).values('book_id'))
+        matched = Q()
+        for term in terms:
+            matched |= self._prefix(term)
+        rank = BookSearchToken.objects.filter(matched, book_id=OuterRef('pk')).order_by()
+        rank = rank.values('book_id').annotate(rank=Sum('weight')).values('rank')
+        return queryset.annotate(search_rank=Subquery(rank, output_field=FloatField()))
+
+
+class _SideTableIndex:
+    """Shared plumbing of the indexes kept in a raw (book_id, title, authors, categories) table."""
+    vendor = None
+    table = None
+    key = None
+
+    def is_supported(self, connection):
+        return connection.vendor == self.vendor
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(self.table)}")
+
+    def delete(self, connection, book_ids, apps=global_apps):
+        with connection.cursor() as cursor:
+            for start in range(0, len(book_ids), CHUNK_SIZE):
+                chunk = book_ids[start:start + CHUNK_SIZE]
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(self.table)} "
+                    f"WHERE {self.key} IN ({', '.join(['%s'] * len(chunk))})",
+                    chunk,
+                )
+
+    def write(self, connection, docs, apps=global_apps):
+        self.delete(connection, [doc[0] for doc in docs], apps)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {connection.ops.quote_name(self.table)} "
+                f"({self.key}, title, authors, categories) VALUES (%s, %s, %s, %s)",
+                docs,
+            )
+
+    def clear(self, connection, apps=global_apps):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(self.table)}")
+
+    def filter(self, queryset, terms):
+        # Joined rather than filtered with IN and ranked per row by a
+        # correlated subquery, so the full-text match runs once per query.
+        match = self.match_expression(terms)
+        return queryset.extra(
+            select={'search_rank': self.rank_sql},
+            select_params=(match,) * self.rank_sql.count('%s'),
+            tables=[self.table],
+            where=[self.match_sql, f"{self.table}.{self.key} = {_book_pk_column(queryset)}"],
+            params=(match,),
+        )
+
+
+class SQLiteFTSIndex(_SideTableIndex):
+    vendor = 'sqlite'
+    table = 'libraries_database_book_fts'
+    key = 'rowid'
+    match_sql = f"{table} MATCH %s"
+    # bm25() is lower for better matches; title hits count most.
+    rank_sql = f"-bm25({table}, 10.0, 5.0, 2.0)"
+
+    def is_supported(self, connection):
+        if connection.vendor != self.vendor:
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            return any('FTS5' in row[0] for row in cursor.fetchall())
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(title, authors, categories, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def match_expression(self, terms):
+        # Terms are \w+ runs, so quoting them is enough to neutralise FTS syntax.
+        return ' '.join(f'"{term}"*' for term in terms)
+
+
+class MySQLFullTextIndex(_SideTableIndex):
+    vendor = 'mysql'
+    table = 'libraries_database_book_fulltext'
+    key = 'book_id'
+    against = "MATCH (title, authors, categories) AGAINST (%s IN BOOLEAN MODE)"
+    match_sql = against
+    rank_sql = against
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "book_id integer NOT NULL PRIMARY KEY, title longtext NOT NULL, "
+                "authors longtext NOT NULL, categories longtext NOT NULL, "
+                "FULLTEXT KEY book_fulltext_idx (title, authors, categories)"
+                ") ENGINE=InnoDB"
+            )
+
+    def match_expression(self, terms):
+        # Terms shorter than innodb_ft_min_token_size are skipped by MySQL.
+        return ' '.join(f'+{term}*' for term in terms)
+
+
+FULLTEXT_INDEXES = (SQLiteFTSIndex(), MySQLFullTextIndex())
+
+_active = {}
+
+
+def get_index(using=DEFAULT_DB_ALIAS):
+    """The index in use on ``using``: a full-text table if one is installed, else the token table."""
+    index = _active.get(using)
+    if index is None:
+        tables = connections[using].introspection.table_names()
+        index = next(
+            (
+                candidate for candidate in FULLTEXT_INDEXES
+                if candidate.vendor == connections[using].vendor and candidate.table in tables
+            ),
+            TokenIndex(),
+        )
+        _active[using] = index
+    return index
+
+
+def reset():
+    """Forget which index is in use, after installing or dropping one."""
+    _active.clear()
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """Create the full-text table for this database if it supports one. Returns the index used."""
+    connection = connections[using]
+    for index in FULLTEXT_INDEXES:
+        if index.is_supported(connection):
+            index.install(connection)
+            break
+    reset()
+    return get_index(using)
+
+
+def index_books(book_ids, using=DEFAULT_DB_ALIAS):
+    """Re-index ``book_ids``; ids of books that no longer exist are dropped."""
+    book_ids = list(dict.fromkeys(book_ids))
+    connection = connections[using]
+    index = get_index(using)
+    for start in range(0, len(book_ids), CHUNK_SIZE):
+        chunk = book_ids[start:start + CHUNK_SIZE]
+        docs = documents(chunk, using=using)
+        found = {doc[0] for doc in docs}
+        missing = [book_id for book_id in chunk if book_id not in found]
+        if missing:
+            index.delete(connection, missing)
+        if docs:
+            index.write(connection, docs)
+
+
+# Book ids waiting for index_books_on_commit, per thread and database alias.
+_queued = threading.local()
+
+
+def index_books_on_commit(book_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Re-index ``book_ids`` when the current transaction commits.
+
+    Ids queued within one transaction, such as every link row cascaded away
+    with an author, are indexed together by a single ``index_books`` call.
+    """
+    queued = _queued.__dict__.setdefault(using, set())
+    queued.update(book_ids)
+    transaction.on_commit(lambda: _index_queued(using), using=using)
+
+
+def _index_queued(using):
+    # The first callback of a transaction takes the whole queue; the rest
+    # find it empty. Ids left by a rolled-back transaction are indexed with
+    # the next batch, which is harmless.
+    book_ids = _queued.__dict__.pop(using, None)
+    if book_ids:
+        index_books(book_ids, using)
+
+
+def remove_books(book_ids, using=DEFAULT_DB_ALIAS):
+    get_index(using).delete(connections[using], list(book_ids))
+
+
+def rebuild_index(apps=global_apps, using=DEFAULT_DB_ALIAS, log=None):
+    """Empty the index and fill it from every book. Returns the number of books indexed."""
+    connection = connections[using]
+    index = get_index(using)
+    Book = apps.get_model('libraries_database', 'Book')
+    indexed, last = 0, 0
+    # One transaction, so searches keep seeing the old index until the new one is complete.
+    with transaction.atomic(using=using):
+        index.clear(connection, apps)
+        while True:
+            chunk = list(
+                Book.objects.using(using).filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE]
+            )
+            if not chunk:
+                return indexed
+            index.write(connection, documents(chunk, apps, using), apps)
+            indexed += len(chunk)
+            last = chunk[-1]
+            if log:
+                log(f"Indexed {indexed} books")
+
+
+def search(queryset, query, using=DEFAULT_DB_ALIAS):
+    """Books of ``queryset`` matching every term of ``query``, annotated with ``search_rank``."""
+    terms = parse_query(query)
+    if not terms:
+        return queryset
+    return get_index(using).filter(queryset, terms)
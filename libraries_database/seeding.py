@@ -0,0 +1,306 @@
+"""
+Bulk generation of large synthetic catalogs for seed_library_data and the
+benchmark commands.
+
+Rows are generated a batch at a time from a seeded ``random.Random`` as
+plain tuples. Each batch goes in with one ``executemany`` INSERT in its own
+transaction, so memory stays flat however many rows are requested, and the
+same seed gives the same data. Skipping model instances and the ORM's
+per-value preparation is what makes tens of millions of rows a matter of
+minutes; ``bulk_create`` spends most of its time there. Names, titles and
+comments come from small pools built once with Faker instead of being
+generated per row.
+
+Borrowings and reviews pick books with Zipf-distributed popularity, so a few
+titles take most of the circulation, and pick members uniformly. Every row
+carries a per-run prefix in its unique columns (ISBN, email, phone), so a
+seed can run against a database that already holds data. Derived data (copy
+counts, rating aggregates, statistics counters, the search index) is brought
+in line with set-based updates at the end, not through per-row signals.
+"""
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db import connection, transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from faker import Faker
+
+from . import autocomplete, availability, caching, counters, fuzzy, search
+from .models import (
+    Author, Book, BookAuthor, BookCategory, Borrowing, Category, Library, Member, Review, late_fee_rate,
+)
+from .ratings import rebuild_rating_aggregates
+
+BATCH_SIZE = 5000
+ZIPF_EXPONENT = 1.0
+# Share of borrowings still out. They are the most recent ones.
+ACTIVE_SHARE = 0.05
+FACULTY_SHARE = 0.1
+# Borrow dates are spread over this many days before today.
+HISTORY_DAYS = 3 * 365
+LOAN_DAYS = {Member.MemberType.STUDENT: 14, Member.MemberType.FACULTY: 28}
+# Relative frequency of ratings 1 to 5.
+RATING_WEIGHTS = (5, 10, 20, 35, 30)
+POOL_SIZE = 500
+
+
+@dataclass
+class DatasetSize:
+    libraries: int = 5
+    authors: int = 2000
+    categories: int = 50
+    books: int = 10000
+    members: int = 5000
+    borrowings: int = 100000
+    reviews: int = 20000
+
+    @property
+    def active_borrowings(self):
+        return round(self.borrowings * ACTIVE_SHARE)
+
+
+class _Pools:
+    """Realistic values drawn once from Faker and reused for every row."""
+
+    def __init__(self, seed):
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.first_names = [fake.first_name() for _ in range(POOL_SIZE)]
+        self.last_names = [fake.last_name() for _ in range(POOL_SIZE)]
+        self.countries = [fake.country()[:100] for _ in range(50)]
+        self.cities = [fake.city()[:50] for _ in range(50)]
+        self.words = [fake.word().capitalize() for _ in range(POOL_SIZE)]
+        self.sentences = [fake.sentence() for _ in range(POOL_SIZE)]
+
+
+def _insert(model, field_names, batch):
+    """INSERT ``batch`` (tuples in ``field_names`` order) with one executemany, stamping created/updated."""
+    opts = model._meta
+    columns = [opts.get_field(name).column for name in field_names]
+    if any(field.name == 'created_at' for field in opts.concrete_fields):
+        columns += ['created_at', 'updated_at']
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        batch = [row + (now, now) for row in batch]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(opts.db_table), ', '.join(quote(column) for column in columns), ', '.join(['%s'] * len(columns))
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, batch)
+
+
+def _batches(total, batch_size):
+    """``(start, count)`` for each batch of ``total`` rows."""
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+def _pks(queryset):
+    return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+
+def _last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def synthetic_isbn(prefix, i):
+    """Fixed-width ISBN of the ``i``-th book seeded by the run ``prefix``; unique per run and row."""
+    return f"{prefix % 10 ** 9:09d}-{i:08d}"
+
+
+def zipf_cum_weights(n, exponent=ZIPF_EXPONENT):
+    """Cumulative weights for ``random.choices`` giving rank r a weight of 1 / r**exponent."""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def _sync_copies(book_ids, chunk_size=10000):
+    """Add each book's active borrowings to its copies, keeping the seeded copies on the shelf."""
+    active = Borrowing.objects.filter(
+        book=OuterRef('pk'), return_date__isnull=True
+    ).order_by().values('book').annotate(total=Count('pk')).values('total')
+    active = Coalesce(Subquery(active, output_field=IntegerField()), Value(0))
+    for start in range(0, len(book_ids), chunk_size):
+        chunk = book_ids[start:start + chunk_size]
+        Book.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1]).update(total_copies=F('available_copies') + active)
+
+
+def seed_dataset(size, batch_size=BATCH_SIZE, log=None, seed=0, zipf_exponent=ZIPF_EXPONENT):
+    """
+    Insert a catalog of ``size`` (a DatasetSize) and return per-table timings.
+
+    Active borrowings and reviews are unique per member and book. Colliding
+    draws are redrawn, so each may use at most half of members * books.
+    """
+    if max(size.active_borrowings, size.reviews) * 2 > size.members * size.books:
+        raise ValueError("Active borrowings and reviews may use at most half of members * books.")
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    pools = _Pools(seed)
+    prefix = time.time_ns()
+    today = timezone.now().date()
+    timings = {}
+
+    def step(name, model, field_names, batches):
+        start = time.perf_counter()
+        rows = 0
+        for batch in batches:
+            _insert(model, field_names, batch)
+            rows += len(batch)
+        seconds = time.perf_counter() - start
+        timings[name] = {'rows': rows, 'seconds': round(seconds, 3)}
+        log(f"{name}: {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:.0f} rows/s)")
+
+    def date_before(days):
+        return today - timedelta(days=rng.randrange(days))
+
+    def full_name():
+        return rng.choice(pools.first_names), rng.choice(pools.last_names)
+
+    step('libraries', Library, ('library_name', 'campus_location', 'contact_email', 'phone_number'), ([
+        (
+            f"{rng.choice(pools.words)} Library",
+            rng.choice(pools.cities),
+            f"library-{prefix}-{i}@example.com",
+            f"{prefix % 10 ** 9:09d}{i:06d}",
+        )
+        for i in range(start, start + count)
+    ] for start, count in _batches(size.libraries, batch_size)))
+
+    first_author, first_category = _last_pk(Author), _last_pk(Category)
+    step('authors', Author, ('first_name', 'last_name', 'birth_date', 'nationality'), ([
+        (
+            first_name,
+            last_name,
+            date_before(60 * 365) - timedelta(days=20 * 365),
+            rng.choice(pools.countries),
+        )
+        for first_name, last_name in (full_name() for _ in range(count))
+    ] for _, count in _batches(size.authors, batch_size)))
+    step('categories', Category, ('category', 'descriptions'), ([
+        (f"{rng.choice(pools.words)} {i}", rng.choice(pools.sentences))
+        for i in range(start, start + count)
+    ] for start, count in _batches(size.categories, batch_size)))
+
+    library_ids = _pks(Library.objects.filter(contact_email__startswith=f"library-{prefix}-"))
+    author_ids = _pks(Author.objects.filter(pk__gt=first_author))
+    category_ids = _pks(Category.objects.filter(pk__gt=first_category))
+
+    book_fields = (
+        'title', 'isbn', 'publication_date', 'total_copies', 'available_copies', 'library',
+        'rating_sum', 'rating_count',
+    )
+    step('books', Book, book_fields, ([
+        (
+            ' '.join(rng.choices(pools.words, k=rng.randint(1, 4)))[:50],
+            synthetic_isbn(prefix, i),
+            date_before(50 * 365),
+            copies,
+            copies,
+            rng.choice(library_ids),
+            0,
+            0,
+        )
+        for i, copies in ((i, rng.randint(1, 5)) for i in range(start, start + count))
+    ] for start, count in _batches(size.books, batch_size)))
+    step('members', Member, ('first_name', 'last_name', 'contact_email', 'phone_number', 'member_type'), ([
+        (
+            first_name,
+            last_name,
+            f"member-{prefix}-{i}@example.com",
+            f"{rng.randrange(10 ** 10):010d}",
+            Member.MemberType.FACULTY.value if rng.random() < FACULTY_SHARE else Member.MemberType.STUDENT.value,
+        )
+        for i, (first_name, last_name) in ((i, full_name()) for i in range(start, start + count))
+    ] for start, count in _batches(size.members, batch_size)))
+
+    book_ids = _pks(Book.objects.filter(isbn__startswith=f"{prefix % 10 ** 9:09d}-"))
+    member_types = dict(
+        Member.objects.filter(contact_email__startswith=f"member-{prefix}-").values_list('pk', 'member_type')
+    )
+    member_ids = sorted(member_types)
+
+    if author_ids:
+        # A few prolific authors, and one to three authors per book.
+        author_weights = zipf_cum_weights(len(author_ids), zipf_exponent)
+        step('book_authors', BookAuthor, ('book', 'author'), ([
+            (book_id, author_id)
+            for book_id in book_ids[start:start + count]
+            for author_id in set(rng.choices(author_ids, cum_weights=author_weights, k=rng.choice((1, 1, 1, 2, 3))))
+        ] for start, count in _batches(len(book_ids), batch_size)))
+    if category_ids:
+        step('book_categories', BookCategory, ('book', 'category'), ([
+            (book_id, category_id)
+            for book_id in book_ids[start:start + count]
+            for category_id in rng.sample(category_ids, min(len(category_ids), rng.choice((1, 1, 2))))
+        ] for start, count in _batches(len(book_ids), batch_size)))
+
+    borrowings = size.borrowings if book_ids and member_ids else 0
+    reviews = size.reviews if book_ids and member_ids else 0
+    # Ranks are shuffled so popularity is not tied to primary keys.
+    ranked_books = rng.sample(book_ids, len(book_ids))
+    book_weights = zipf_cum_weights(len(ranked_books), zipf_exponent)
+
+    def draw_pairs(k):
+        return list(zip(rng.choices(member_ids, k=k), rng.choices(ranked_books, cum_weights=book_weights, k=k)))
+
+    def unique_pairs(k, taken):
+        pairs = []
+        while len(pairs) < k:
+            for pair in draw_pairs(k - len(pairs)):
+                if pair not in taken:
+                    taken.add(pair)
+                    pairs.append(pair)
+        return pairs
+
+    fee_rates = {member_type: late_fee_rate(member_type) for member_type in LOAN_DAYS}
+    first_active = borrowings - size.active_borrowings
+    active_pairs = set()
+    days_per_row = HISTORY_DAYS / max(borrowings, 1)
+
+    def borrowing_batch(start, count):
+        # Borrow dates rise with i, so the active rows at the end are the most recent.
+        returned = max(0, min(count, first_active - start))
+        pairs = draw_pairs(returned) + unique_pairs(count - returned, active_pairs)
+        rows = []
+        for i, (member_id, book_id) in enumerate(pairs, start):
+            loan_days = LOAN_DAYS[member_types[member_id]]
+            borrow_date = min(today - timedelta(days=HISTORY_DAYS - int(i * days_per_row) - rng.randrange(3)), today)
+            due_date = borrow_date + timedelta(days=loan_days)
+            return_date, late_fee = None, 0
+            if i < first_active:
+                return_date = min(borrow_date + timedelta(days=rng.randint(1, loan_days + 10)), today)
+                late_fee = max(0, (return_date - due_date).days) * fee_rates[member_types[member_id]]
+            rows.append((member_id, book_id, borrow_date, due_date, return_date, late_fee))
+        return rows
+
+    borrowing_fields = ('member', 'book', 'borrow_date', 'due_date', 'return_date', 'late_fee')
+    step('borrowings', Borrowing, borrowing_fields, (
+        borrowing_batch(start, count) for start, count in _batches(borrowings, batch_size)
+    ))
+    reviewed = set()
+    step('reviews', Review, ('member', 'book', 'rating', 'comment', 'review_date'), ([
+        (member_id, book_id, rating, rng.choice(pools.sentences), date_before(HISTORY_DAYS))
+        for (member_id, book_id), rating in zip(
+            unique_pairs(count, reviewed), rng.choices(range(1, 6), weights=RATING_WEIGHTS, k=count)
+        )
+    ] for _, count in _batches(reviews, batch_size)))
+
+    start = time.perf_counter()
+    if book_ids:
+        _sync_copies(book_ids)
+    rebuild_rating_aggregates()
+    counters.reconcile()
+    search.index_books(book_ids)
+    fuzzy.index_names(Author, author_ids)
+    fuzzy.index_names(Member, member_ids)
+    caching.bump_version(Library, Author, Category, Book, Member, BookAuthor, BookCategory, Borrowing, Review)
+    availability.clear()
+    autocomplete.clear()
+    timings['derived'] = {'seconds': round(time.perf_counter() - start, 3)}
+    log(f"derived columns and counters in {timings['derived']['seconds']}s")
+    return {'size': asdict(size), 'seed': seed, 'timings': timings}
@@ -0,0 +1,313 @@
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autocomplete, availability, caching, counters, fuzzy, instrumentation, search
+from .models import Author, Book, BookAuthor, BookCategory, Borrowing, Category, Library, Member, Review
+
+
+# -------------------------
+# RESPONSE CACHE VERSIONS
+# -------------------------
+@receiver(post_save)
+@receiver(post_delete)
+def bump_cache_version(sender, raw=False, **kwargs):
+    if sender._meta.app_label == 'libraries_database' and not raw:
+        caching.bump_version(sender)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def evict_book_availability(sender, instance, raw=False, **kwargs):
+    if not raw:
+        availability.invalidate([instance.pk])
+
+
+# -------------------------
+# BOOK RATING AGGREGATES
+# -------------------------
+def _apply_rating_delta(book_id, rating_delta, count_delta):
+    """Shift a book's rating_sum/rating_count in place with a single UPDATE."""
+    Book.objects.filter(pk=book_id).update(
+        rating_sum=F('rating_sum') + rating_delta,
+        rating_count=F('rating_count') + count_delta,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_rating = (
+        Review.objects.filter(pk=instance.pk).values_list('book_id', 'rating').first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        _apply_rating_delta(instance.book_id, instance.rating, 1)
+        return
+
+    previous_book_id, previous_rating = previous
+    if previous_book_id != instance.book_id:
+        _apply_rating_delta(previous_book_id, -previous_rating, -1)
+        _apply_rating_delta(instance.book_id, instance.rating, 1)
+    elif previous_rating != instance.rating:
+        _apply_rating_delta(instance.book_id, instance.rating - previous_rating, 0)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    _apply_rating_delta(instance.book_id, -instance.rating, -1)
+
+
+# -------------------------
+# STATISTICS COUNTERS
+# -------------------------
+@receiver(post_save, sender=Library)
+def add_library_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.create_library_counters(instance.pk)
+
+
+@receiver(post_delete, sender=Library)
+def remove_library_counters(sender, instance, **kwargs):
+    counters.delete_library_counters(instance.pk)
+
+
+def _cascades_from(origin, *models):
+    # ``origin`` is the instance or queryset whose delete() sent the signal.
+    return isinstance(origin, models) or getattr(origin, 'model', None) in models
+
+
+# A delete that cascades is counted out up front with grouped queries; the
+# per-row receivers further down skip the rows it covers.
+@receiver(pre_delete, sender=Library)
+def count_out_library_books(sender, instance, **kwargs):
+    counters.books_deleted(Book.objects.filter(library_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Book)
+def count_out_book_borrowings(sender, instance, origin=None, **kwargs):
+    if not _cascades_from(origin, Library):
+        counters.borrowings_deleted(Borrowing.objects.filter(book_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Member)
+def count_out_member_borrowings(sender, instance, **kwargs):
+    counters.borrowings_deleted(Borrowing.objects.filter(member_id=instance.pk))
+
+
+@receiver(post_save, sender=Book)
+def count_new_book(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.apply({(counters.BOOKS, instance.library_id): 1})
+
+
+@receiver(pre_save, sender=Book)
+def remember_previous_library(sender, instance, raw=False, **kwargs):
+    instance._previous_library_id = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_library_id = (
+        Book.objects.filter(pk=instance.pk).values_list('library_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Book)
+def count_moved_book(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_library_id', None)
+    if raw or created or previous is None or previous == instance.library_id:
+        return
+    counters.book_moved(instance.pk, previous, instance.library_id)
+
+
+@receiver(post_delete, sender=Book)
+def count_deleted_book(sender, instance, origin=None, **kwargs):
+    if _cascades_from(origin, Library):
+        return
+    counters.apply({(counters.BOOKS, instance.library_id): -1})
+
+
+@receiver(post_save, sender=Member)
+def count_new_member(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.apply({(counters.MEMBERS, None): 1})
+
+
+@receiver(post_delete, sender=Member)
+def count_deleted_member(sender, instance, **kwargs):
+    counters.apply({(counters.MEMBERS, None): -1})
+
+
+@receiver(pre_save, sender=Borrowing)
+def remember_previous_borrowing(sender, instance, raw=False, **kwargs):
+    instance._previous_borrowing = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_borrowing = (
+        Borrowing.objects.filter(pk=instance.pk).values_list('book_id', 'return_date').first()
+    )
+
+
+@receiver(post_save, sender=Borrowing)
+def count_saved_borrowing(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    active = instance.return_date is None
+    previous = getattr(instance, '_previous_borrowing', None)
+    if created or previous is None:
+        counters.borrowings_changed([instance.book_id], borrowed=1, active=int(active))
+        return
+
+    previous_book_id, previous_return_date = previous
+    was_active = previous_return_date is None
+    if previous_book_id != instance.book_id:
+        counters.borrowings_changed([previous_book_id], borrowed=-1, active=-int(was_active))
+        counters.borrowings_changed([instance.book_id], borrowed=1, active=int(active))
+    elif was_active != active:
+        counters.borrowings_changed([instance.book_id], active=1 if active else -1)
+
+
+@receiver(post_delete, sender=Borrowing)
+def count_deleted_borrowing(sender, instance, origin=None, **kwargs):
+    if _cascades_from(origin, Library, Book, Member):
+        return
+    counters.borrowings_changed(
+        [instance.book_id], borrowed=-1, active=-int(instance.return_date is None)
+    )
+
+
+# -------------------------
+# SEARCH INDEX
+# -------------------------
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        search.index_books([instance.pk], using)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, using, **kwargs):
+    search.remove_books([instance.pk], using)
+
+
+@receiver(pre_save, sender=Author)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Member)
+def remember_previous_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = ('category',) if sender is Category else ('first_name', 'last_name')
+    instance._previous_name = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def reindex_renamed_books(sender, instance, created, using, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_name', None)
+    if raw or created or previous is None:
+        return
+    if sender is Author:
+        if previous == (instance.first_name, instance.last_name):
+            return
+        links = BookAuthor.objects.using(using).filter(author=instance)
+    else:
+        if previous == (instance.category,):
+            return
+        links = BookCategory.objects.using(using).filter(category=instance)
+    search.index_books(links.values_list('book_id', flat=True), using)
+
+
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_save, sender=BookCategory)
+def reindex_linked_book(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        search.index_books([instance.book_id], using)
+
+
+@receiver(post_delete, sender=BookAuthor)
+@receiver(post_delete, sender=BookCategory)
+def reindex_unlinked_book(sender, instance, using, origin=None, **kwargs):
+    # A book being deleted drops out of the index in unindex_deleted_book.
+    # Deleting an author or category cascades one signal per link row, so
+    # the books are queued and re-indexed together on commit.
+    if isinstance(origin, Book) or getattr(origin, 'model', None) is Book:
+        return
+    search.index_books_on_commit([instance.book_id], using)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.categories.through)
+def reindex_m2m_books(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_books([instance.pk], using)
+    elif action == 'pre_clear':
+        # A reverse clear() does not say which books lose the link.
+        column = 'author' if sender is BookAuthor else 'category'
+        instance._cleared_book_ids = list(
+            sender.objects.using(using).filter(**{column: instance}).values_list('book_id', flat=True)
+        )
+    elif action == 'post_clear':
+        search.index_books(getattr(instance, '_cleared_book_ids', []), using)
+    elif action in ('post_add', 'post_remove'):
+        search.index_books(pk_set, using)
+
+
+# -------------------------
+# NAME TRIGRAMS
+# -------------------------
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Member)
+def index_name_trigrams(sender, instance, created, raw=False, **kwargs):
+    # Rows deleted with the person go with the foreign key cascade.
+    if raw:
+        return
+    if created or getattr(instance, '_previous_name', None) != (instance.first_name, instance.last_name):
+        fuzzy.index_names(sender, [instance.pk])
+
+
+# -------------------------
+# AUTOCOMPLETE
+# -------------------------
+def _autocomplete_entry(instance):
+    if isinstance(instance, Book):
+        return 'title', instance.title
+    if isinstance(instance, Author):
+        return 'author', f"{instance.first_name} {instance.last_name}"
+    return 'category', instance.category
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def update_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        kind, label = _autocomplete_entry(instance)
+        autocomplete.update(kind, instance.pk, label)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+def drop_from_autocomplete(sender, instance, **kwargs):
+    kind, _ = _autocomplete_entry(instance)
+    autocomplete.update(kind, instance.pk, None)
+
+
+# -------------------------
+# DB CONNECTIONS
+# -------------------------
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    instrumentation.count_connection()
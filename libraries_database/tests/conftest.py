@@ -1,8 +1,28 @@
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
 from .factories import LibraryFactory, AuthorFactory, CategoryFactory, BookFactory, MemberFactory
 
+# -------------------------
+# Response Cache Fixture
+# -------------------------
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Cached responses and in-process stats must not leak between tests."""
+    from libraries_database import autocomplete, availability, instrumentation
+    from libraries_database.caching import reset_cache_stats
+
+    cache.clear()
+    reset_cache_stats()
+    availability.clear()
+    autocomplete.clear()
+    instrumentation.reset_route_histograms()
+    yield
+
+
 # -------------------------
 # API Client Fixture
 # -------------------------
@@ -11,6 +31,36 @@ def api_client():
     return APIClient()
 
 
+# -------------------------
+# Query Count Fixture
+# -------------------------
+@pytest.fixture
+def assert_constant_list_queries(client):
+    """
+    Fail when a list endpoint's SQL count grows with the number of rows on the page.
+
+    ``make_rows(n)`` must create ``n`` more rows that show up on the first page of ``url``.
+    The endpoint is hit with a single row, then with a fuller page, and both runs
+    must issue the same number of queries.
+    """
+    def check(url, make_rows, small=1, large=5):
+        counts = []
+        make_rows(small)
+        for extra_rows in (0, large - small):
+            make_rows(extra_rows)
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            assert response.status_code == 200
+            counts.append(len(ctx.captured_queries))
+        assert counts[0] == counts[1], (
+            f"{url} ran {counts[0]} queries for {small} row(s) "
+            f"but {counts[1]} queries for {large} rows"
+        )
+        return counts[0]
+
+    return check
+
+
 # -------------------------
 # Library Fixture
 # -------------------------
@@ -2,7 +2,7 @@ import factory
 from factory.django import DjangoModelFactory
 from datetime import date, timedelta
 from faker import Faker
-from libraries_database.models import Library, Author, Category, Book, Member, Borrowing
+from libraries_database.models import Library, Author, Category, Book, Member, Borrowing, Review
 
 fake = Faker()
 
@@ -69,7 +69,7 @@ class BookFactory(DjangoModelFactory):
     isbn = factory.Faker("isbn13")
     publication_date = factory.Faker("date")
     total_copies = factory.Faker("random_int", min=1, max=10)
-    available_copies = factory.Faker("random_int", min=1, max=10)
+    available_copies = factory.LazyAttribute(lambda book: book.total_copies)
     library = factory.SubFactory(LibraryFactory)
 
     @factory.post_generation
@@ -105,4 +105,18 @@ class BorrowingFactory(DjangoModelFactory):
     borrow_date = factory.Faker("date_this_year")
     due_date = factory.Faker("future_date", end_date="+14d")
     return_date = None
-    late_fee = 0
\ No newline at end of file
+    late_fee = 0
+
+
+# -------------------------
+# Review Factory
+# -------------------------
+class ReviewFactory(DjangoModelFactory):
+    class Meta:
+        model = Review
+
+    member = factory.SubFactory(MemberFactory)
+    book = factory.SubFactory(BookFactory)
+    rating = factory.Faker("random_int", min=1, max=5)
+    comment = factory.Faker("sentence")
+    review_date = factory.Faker("date_this_year")
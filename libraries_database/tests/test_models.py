@@ -1,5 +1,10 @@
 # libraries_database/tests/test_models.py
-from django.test import TestCase
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from libraries_database.late_fees import accrue_late_fees
 from libraries_database.models import*
 
 class LibraryModelTest(TestCase):
@@ -36,6 +41,10 @@ class BookModelTest(TestCase):
         with self.assertRaises(Exception):
             self.book.full_clean()
 
+    def test_available_copies_constraint_enforced_in_database(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(pk=self.book.pk).update(available_copies=models.F('total_copies') + 1)
+
 class MemberModelTest(TestCase):
     def test_member_str_and_overdue(self):
         member = Member.objects.create(
@@ -87,6 +96,49 @@ class BorrowingModelTest(TestCase):
                 due_date=timezone.now().date() + timezone.timedelta(days=10),
             )
 
+    @override_settings(LATE_FEE_RATES={'student': 5, 'faculty': 2})
+    def test_accrue_late_fees_is_set_based_and_incremental(self):
+        today = timezone.now().date()
+        faculty = Member.objects.create(
+            first_name="Ada",
+            last_name="Prof",
+            contact_email="ada@example.com",
+            phone_number="7777777777",
+            member_type=Member.MemberType.FACULTY,
+        )
+        late = Borrowing.objects.create(
+            member=self.member, book=self.book,
+            borrow_date=today - timezone.timedelta(days=20), due_date=today - timezone.timedelta(days=6),
+        )
+        late_faculty = Borrowing.objects.create(
+            member=faculty, book=self.book,
+            borrow_date=today - timezone.timedelta(days=20), due_date=today - timezone.timedelta(days=3),
+        )
+        not_due = Borrowing.objects.create(
+            member=self.member, book=Book.objects.create(
+                title="Refactoring", isbn="444555666", total_copies=1, available_copies=1, library=self.library,
+            ),
+            borrow_date=today, due_date=today + timezone.timedelta(days=7),
+        )
+
+        out = StringIO()
+        call_command('accrue_late_fees', stdout=out)
+        self.assertIn("Accrued late fees on 2 borrowings", out.getvalue())
+        late.refresh_from_db()
+        late_faculty.refresh_from_db()
+        not_due.refresh_from_db()
+        self.assertEqual(late.late_fee, 30)
+        self.assertEqual(late_faculty.late_fee, 6)
+        self.assertEqual(late.fees_accrued_on, today)
+        self.assertEqual(not_due.late_fee, 0)
+        self.assertIsNone(not_due.fees_accrued_on)
+
+        self.assertEqual(accrue_late_fees(), 0)
+        self.assertEqual(accrue_late_fees(as_of=today + timezone.timedelta(days=1)), 2)
+        late.refresh_from_db()
+        self.assertEqual(late.late_fee, 35)
+        self.assertEqual(late.calculate_late_fee(today + timezone.timedelta(days=1)), 35)
+
 class ReviewModelTest(TestCase):
     def setUp(self):
         self.library = Library.objects.create(
@@ -118,3 +170,79 @@ class ReviewModelTest(TestCase):
             review_date=timezone.now().date(),
         )
         self.assertIn("Review", str(review))
+
+    def _review(self, member=None, rating=4):
+        return Review.objects.create(
+            member=member or self.member,
+            book=self.book,
+            rating=rating,
+            comment="Good read",
+            review_date=timezone.now().date(),
+        )
+
+    def test_rating_aggregates_follow_review_writes(self):
+        other = Member.objects.create(
+            first_name="Bob",
+            last_name="Jones",
+            contact_email="bob@example.com",
+            phone_number="6666666666",
+        )
+        first = self._review(rating=4)
+        self._review(member=other, rating=5)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating_sum, self.book.rating_count), (9, 2))
+        self.assertEqual(self.book.average_rating(), 4.5)
+
+        first.rating = 2
+        first.save()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating_sum, self.book.rating_count), (7, 2))
+
+        Review.objects.filter(pk=first.pk).delete()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating_sum, self.book.rating_count), (5, 1))
+        self.assertEqual(self.book.average_rating(), 5)
+
+    def test_saving_a_stale_book_keeps_rating_aggregates(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        self._review(rating=4)
+        stale.title = "Python Tricks, 2nd ed."
+        stale.save()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, "Python Tricks, 2nd ed.")
+        self.assertEqual((self.book.rating_sum, self.book.rating_count), (4, 1))
+
+    def test_rebuild_rating_aggregates_command(self):
+        self._review(rating=3)
+        Book.objects.filter(pk=self.book.pk).update(rating_sum=0, rating_count=0)
+        before = Book.objects.get(pk=self.book.pk).updated_at
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating_sum, self.book.rating_count), (3, 1))
+        self.assertGreater(self.book.updated_at, before)
+
+
+class SeedDatasetTest(TestCase):
+    def test_seed_dataset_respects_constraints_and_derived_columns(self):
+        from django.db.models import F
+        from libraries_database import counters
+        from libraries_database.seeding import DatasetSize, seed_dataset
+
+        size = DatasetSize(libraries=2, authors=5, categories=3, books=20, members=10, borrowings=150, reviews=40)
+        seed_dataset(size, batch_size=7)
+        seed_dataset(size, batch_size=7)
+
+        self.assertEqual(Book.objects.count(), 40)
+        titles = list(Book.objects.order_by('pk').values_list('title', flat=True))
+        self.assertEqual(titles[:20], titles[20:])
+        self.assertEqual(Borrowing.objects.count(), 300)
+        self.assertEqual(Review.objects.count(), 80)
+        self.assertFalse(Book.objects.filter(available_copies__gt=F('total_copies')).exists())
+        self.assertEqual(counters.reconcile(), {})
+        self.assertEqual(
+            Book.objects.filter(rating_count__gt=0).count(),
+            Review.objects.values('book').distinct().count(),
+        )
+
+        with self.assertRaises(ValueError):
+            seed_dataset(DatasetSize(books=1, members=1, borrowings=0, reviews=1))
@@ -1,6 +1,21 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from libraries_database.caching import cache_stats
+from libraries_database.instrumentation import route_histograms
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .factories import BookFactory, MemberFactory, BorrowingFactory, AuthorFactory, CategoryFactory, LibraryFactory
+from .factories import (
+    BookFactory, MemberFactory, BorrowingFactory, AuthorFactory, CategoryFactory, LibraryFactory,
+    ReviewFactory,
+)
+from libraries_database.models import Author, Book, Borrowing, StatisticCounter
+from libraries_database.serializers import BookSerializer
 
 
 pytestmark = pytest.mark.django_db
@@ -51,6 +66,395 @@ def test_create_book(client):
 
 
 
+def test_update_book_writes_only_changed_links(client):
+    keep, drop, add = AuthorFactory.create_batch(3)
+    book = BookFactory(authors=[keep, drop])
+    url = reverse("book-detail", args=[book.book_id])
+
+    def link_writes(payload):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.patch(url, payload, content_type="application/json")
+        assert response.status_code == 200
+        return [
+            query["sql"].split()[0] for query in ctx.captured_queries
+            if "bookauthor" in query["sql"].lower() and not query["sql"].startswith("SELECT")
+        ]
+
+    assert link_writes({"authors": [drop.author_id, keep.author_id]}) == []
+    assert link_writes({"authors": [keep.author_id, add.author_id]}) == ["DELETE", "INSERT"]
+    assert set(book.authors.values_list("pk", flat=True)) == {keep.author_id, add.author_id}
+
+
+@pytest.fixture(params=["tokens", "fts5"])
+def search_index(request):
+    """Run a search test against the token table and against an FTS5 table."""
+    from libraries_database import search
+
+    search.reset()
+    if request.param == "fts5":
+        index = search.install()
+        if not isinstance(index, search.SQLiteFTSIndex):
+            pytest.skip("SQLite was built without FTS5.")
+    yield search.get_index()
+    search.get_index().uninstall(connection)
+    search.reset()
+
+
+def _search(client, query, **params):
+    response = client.get(reverse("book-list"), {"search": query, **params})
+    assert response.status_code == 200
+    return [book["title"] for book in response.data["results"]]
+
+
+def test_search_ranks_title_matches_and_requires_every_term(client, search_index):
+    dostoevsky = AuthorFactory(first_name="Fyodor", last_name="Dostoevsky")
+    BookFactory(title="Crime and Punishment", authors=[dostoevsky])
+    BookFactory(title="The Idiot", authors=[dostoevsky])
+    BookFactory(title="Dostoevsky: A Life", authors=[AuthorFactory(first_name="Joseph", last_name="Frank")])
+    BookFactory(title="Unrelated")
+
+    assert _search(client, "dostoev")[0] == "Dostoevsky: A Life"
+    assert set(_search(client, "Dostoévsky")) == {"Crime and Punishment", "The Idiot", "Dostoevsky: A Life"}
+    assert _search(client, "crime dostoevsky") == ["Crime and Punishment"]
+    assert _search(client, "dostoevsky", ordering="title") == ["Crime and Punishment", "Dostoevsky: A Life", "The Idiot"]
+    assert _search(client, "nothing-like-this") == []
+
+    facets = client.get(reverse("book-facets"), {"search": "dostoevsky"})
+    assert facets.status_code == 200
+    assert facets.data["count"] == 3
+
+
+def test_search_index_follows_renames_and_link_changes(client, search_index, django_capture_on_commit_callbacks):
+    author, other = AuthorFactory(last_name="Tolstoy"), AuthorFactory(last_name="Chekhov")
+    category = CategoryFactory(category="Classics")
+    book = BookFactory(title="Resurrection", authors=[author], categories=[category])
+    assert _search(client, "tolstoy classics") == ["Resurrection"]
+
+    author.last_name = "Tolstoi"
+    author.save()
+    category.category = "Russian"
+    category.save()
+    assert _search(client, "tolstoy") == []
+    assert _search(client, "tolstoi russian") == ["Resurrection"]
+
+    response = client.patch(
+        reverse("book-detail", args=[book.book_id]), {"authors": [other.author_id]}, content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert _search(client, "tolstoi") == []
+    assert _search(client, "chekhov") == ["Resurrection"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        other.delete()
+    assert _search(client, "chekhov") == []
+    book.delete()
+    assert _search(client, "resurrection") == []
+
+
+def test_deleting_an_author_reindexes_its_books_once(client, monkeypatch, django_capture_on_commit_callbacks):
+    from libraries_database import search
+
+    author = AuthorFactory(last_name="Pushkin")
+    books = [BookFactory(authors=[author]) for _ in range(3)]
+    calls = []
+    index_books = search.index_books
+    monkeypatch.setattr(search, "index_books", lambda ids, *args: calls.append(set(ids)) or index_books(ids, *args))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        author.delete()
+    assert calls == [{book.book_id for book in books}]
+    assert _search(client, "pushkin") == []
+
+
+def test_book_link_filters_match_any_or_all_without_distinct(client):
+    tolstoy, chekhov, other = AuthorFactory.create_batch(3)
+    drama, stories = CategoryFactory.create_batch(2)
+    BookFactory(title="Both", authors=[tolstoy, chekhov], categories=[drama, stories], available_copies=1)
+    BookFactory(title="Tolstoy", authors=[tolstoy], categories=[drama], available_copies=0)
+    BookFactory(title="Chekhov", authors=[chekhov], categories=[stories], available_copies=1)
+    BookFactory(title="Other", authors=[other], categories=[])
+
+    def titles(**params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse("book-list"), {"ordering": "title", **params})
+        assert response.status_code == 200, response.data
+        assert not any("DISTINCT" in query["sql"] for query in ctx.captured_queries)
+        return [book["title"] for book in response.data["results"]]
+
+    assert titles(authors=[tolstoy.pk, chekhov.pk]) == ["Both", "Chekhov", "Tolstoy"]
+    assert titles(authors=f"{tolstoy.pk},{chekhov.pk}") == ["Both", "Chekhov", "Tolstoy"]
+    assert titles(authors__all=[tolstoy.pk, chekhov.pk]) == ["Both"]
+    assert titles(authors=tolstoy.pk, categories=stories.pk) == ["Both"]
+    assert titles(categories__all=f"{drama.pk},{stories.pk}", available_copies__gte=1) == ["Both"]
+    assert titles(categories=drama.pk, available_copies__gte=1) == ["Both"]
+    assert titles(authors=999999) == []
+    assert client.get(reverse("book-list"), {"authors": "tolstoy"}).status_code == 400
+
+
+def test_book_facets_in_fixed_queries_cached_by_normalized_filter(client, django_assert_num_queries):
+    main, branch = LibraryFactory(library_name="Main"), LibraryFactory(library_name="Branch")
+    tolstoy, chekhov = AuthorFactory.create_batch(2)
+    drama, stories = CategoryFactory(category="Drama"), CategoryFactory(category="Stories")
+    BookFactory(
+        title="War and Peace", library=main, authors=[tolstoy, chekhov], categories=[drama, stories],
+        publication_date=date(1995, 5, 1), available_copies=1,
+    )
+    BookFactory(
+        library=main, authors=[tolstoy], categories=[drama], publication_date=date(1999, 1, 1), available_copies=0
+    )
+    BookFactory(library=branch, authors=[chekhov], categories=[stories], publication_date=date(2003, 1, 1))
+    BookFactory(library=branch, authors=[tolstoy], categories=[drama], publication_date=None)
+    url = reverse("book-facets")
+
+    with django_assert_num_queries(3):
+        response = client.get(url, {"authors": f"{chekhov.pk},{tolstoy.pk}", "available_copies__gte": "0"})
+    assert response.status_code == 200
+    assert response.data == {
+        "count": 4,
+        "categories": [
+            {"id": drama.pk, "name": "Drama", "count": 3},
+            {"id": stories.pk, "name": "Stories", "count": 2},
+        ],
+        "libraries": [{"id": main.pk, "name": "Main", "count": 2}, {"id": branch.pk, "name": "Branch", "count": 2}],
+        "availability": {"available": 3, "unavailable": 1},
+        "decades": [{"decade": 1990, "count": 2}, {"decade": 2000, "count": 1}, {"decade": None, "count": 1}],
+    }
+
+    # The same filter spelled differently is served from the cache.
+    with django_assert_num_queries(0):
+        again = client.get(url, {"authors": [tolstoy.pk, chekhov.pk], "available_copies__gte": "0.0", "page": 2})
+    assert again.data == response.data
+
+    filtered = client.get(url, {"authors": chekhov.pk, "library": branch.pk}).data
+    assert filtered["count"] == 1
+    searched = client.get(url, {"search": "war peace"}).data
+    assert searched["count"] == 1
+    assert searched["libraries"] == [{"id": main.pk, "name": "Main", "count": 1}]
+    assert filtered["categories"] == [{"id": stories.pk, "name": "Stories", "count": 1}]
+
+    BookFactory(library=branch, authors=[chekhov], categories=[stories], publication_date=date(2010, 1, 1))
+    assert client.get(url, {"authors": chekhov.pk, "library": branch.pk}).data["count"] == 2
+    assert client.get(url, {"authors": "chekhov"}).status_code == 400
+
+    branch.library_name = "Riverside"
+    branch.save()
+    libraries = client.get(url, {"authors": chekhov.pk, "library": branch.pk}).data["libraries"]
+    assert libraries == [{"id": branch.pk, "name": "Riverside", "count": 2}]
+
+
+def _suggest(client, q, kind="title", **params):
+    response = client.get(reverse("autocomplete"), {"q": q, "kind": kind, **params})
+    assert response.status_code == 200
+    return [result["value"] for result in response.data["results"]]
+
+
+def test_autocomplete_matches_prefixes_without_queries(client, django_assert_num_queries):
+    BookFactory(title="Crime and Punishment")
+    BookFactory(title="Crème Brûlée Basics")
+    BookFactory(title="The Idiot")
+    AuthorFactory(first_name="Fyodor", last_name="Dostoevsky")
+    CategoryFactory(category="Russian Classics")
+
+    assert _suggest(client, "cr") == ["Crème Brûlée Basics", "Crime and Punishment"]
+    with django_assert_num_queries(0):
+        assert _suggest(client, "CRIME an") == ["Crime and Punishment"]
+    assert _suggest(client, "idiot") == []
+    assert _suggest(client, "dost", kind="author") == ["Fyodor Dostoevsky"]
+    assert _suggest(client, "class", kind="category") == ["Russian Classics"]
+    assert _suggest(client, "c", limit=1) == ["Crème Brûlée Basics"]
+    assert _suggest(client, "  ") == []
+    assert client.get(reverse("autocomplete"), {"q": "a", "kind": "isbn"}).status_code == 400
+    assert client.get(reverse("autocomplete"), {"q": "a", "limit": 500}).status_code == 400
+
+
+def test_autocomplete_follows_committed_writes(client, django_capture_on_commit_callbacks):
+    book = BookFactory(title="Resurrection")
+    author = AuthorFactory(first_name="Leo", last_name="Tolstoy")
+    assert _suggest(client, "res") == ["Resurrection"]
+    assert _suggest(client, "tol", kind="author") == ["Leo Tolstoy"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        book.title = "War and Peace"
+        book.save()
+        BookFactory(title="Anna Karenina")
+        author.delete()
+    assert _suggest(client, "res") == []
+    assert _suggest(client, "war") == ["War and Peace"]
+    assert _suggest(client, "anna") == ["Anna Karenina"]
+    assert _suggest(client, "tol", kind="author") == []
+
+
+def test_name_fuzzy_ranks_misspelled_authors(client):
+    AuthorFactory(first_name="Fyodor", last_name="Dostoevsky")
+    AuthorFactory(first_name="Pyotr", last_name="Tchaikovsky")
+    AuthorFactory(first_name="Leo", last_name="Tolstoy")
+
+    def names(query, **params):
+        response = client.get(reverse("author-list"), {"name_fuzzy": query, **params})
+        assert response.status_code == 200
+        return [author["last_name"] for author in response.data["results"]]
+
+    for spelling in ("Dostoyevsky", "dostoevski", "Dostoévsky", "Fyodor Dostoevskiy"):
+        assert names(spelling) == ["Dostoevsky"]
+    assert names("Tschaikowsky") == ["Tchaikovsky"]
+    assert names("sky") == ["Dostoevsky", "Tchaikovsky"]
+    assert names("sky", ordering="-last_name") == ["Tchaikovsky", "Dostoevsky"]
+    assert names("Hemingway") == []
+    assert names("!!") == []
+
+
+def test_name_fuzzy_follows_member_renames(client):
+    member = MemberFactory(first_name="Anna", last_name="Karenina")
+    other = MemberFactory(first_name="Ivan", last_name="Petrov")
+
+    def ids(query):
+        response = client.get(reverse("member-list"), {"name_fuzzy": query})
+        assert response.status_code == 200
+        return [row["member_id"] for row in response.data["results"]]
+
+    assert ids("Karenin") == [member.pk]
+    member.last_name = "Vronskaya"
+    member.save()
+    assert ids("Karenin") == []
+    assert ids("Vronskaja") == [member.pk]
+    other.delete()
+    assert ids("Petrov") == []
+
+
+def test_book_serializer_resolves_related_ids_in_one_query(django_assert_num_queries):
+    authors = AuthorFactory.create_batch(15)
+    categories = CategoryFactory.create_batch(15)
+    library = LibraryFactory()
+    payload = {
+        "title": "Bulk", "isbn": "BULK-1", "library": library.pk, "total_copies": 1, "available_copies": 1,
+        "authors": [author.pk for author in authors], "categories": [category.pk for category in categories],
+    }
+    serializer = BookSerializer(data=payload)
+    # library, authors, categories, isbn uniqueness
+    with django_assert_num_queries(4):
+        assert serializer.is_valid(), serializer.errors
+    assert serializer.validated_data["authors"] == authors
+
+    serializer = BookSerializer(data={**payload, "authors": [authors[0].pk, 999998, 999999]})
+    assert not serializer.is_valid()
+    assert "999998" in str(serializer.errors["authors"]) and "999999" in str(serializer.errors["authors"])
+
+
+def test_book_list_serializer_resolves_related_ids_once(django_assert_num_queries):
+    authors = AuthorFactory.create_batch(6)
+    library = LibraryFactory()
+    payload = [
+        {
+            "title": f"Bulk {i}", "isbn": f"BULK-{i}", "library": library.pk, "total_copies": 1,
+            "available_copies": 1, "authors": [author.pk for author in authors[i:i + 3]],
+        }
+        for i in range(4)
+    ]
+    serializer = BookSerializer(data=payload, many=True)
+    # authors once for the whole list; library and isbn uniqueness per item
+    with django_assert_num_queries(1 + 2 * len(payload)):
+        assert serializer.is_valid(), serializer.errors
+    assert [item["authors"] for item in serializer.validated_data] == [authors[i:i + 3] for i in range(4)]
+
+
+def test_list_books_reads_stored_rating(client):
+    for book in BookFactory.create_batch(3):
+        ReviewFactory.create_batch(2, book=book, rating=4)
+    url = reverse("book-list")
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert [row["average_rating"] for row in response.data["results"]] == [4, 4, 4]
+    assert not any("review" in query["sql"].lower() for query in ctx.captured_queries)
+
+
+def test_book_list_query_count_is_bounded(assert_constant_list_queries):
+    def make_rows(n):
+        for book in BookFactory.create_batch(n, authors=AuthorFactory.create_batch(2)):
+            ReviewFactory(book=book)
+
+    # validators, count, page, authors, categories
+    assert assert_constant_list_queries(reverse("book-list"), make_rows) <= 5
+
+
+def test_book_retrieve_prefetches_relations(client, book, django_assert_max_num_queries):
+    url = reverse("book-detail", args=[book.book_id])
+    with django_assert_max_num_queries(3):
+        response = client.get(url)
+    assert response.status_code == 200
+    assert response.data["authors_detail"][0]["author_id"] == book.authors.get().author_id
+
+
+def test_book_list_is_served_from_cache(client, django_assert_num_queries):
+    BookFactory.create_batch(2)
+    url = reverse("book-list")
+    first = client.get(url, {"page_size": 10, "ordering": "title"})
+    with django_assert_num_queries(0):
+        second = client.get(url, {"ordering": "title", "page_size": 10})
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert cache_stats()["book"] == {"hits": 1, "misses": 1}
+
+
+def test_book_cache_invalidated_by_related_writes(client):
+    book = BookFactory(available_copies=2, total_copies=2)
+    url = reverse("book-detail", args=[book.book_id])
+    assert client.get(url).data["average_rating"] is None
+
+    ReviewFactory(book=book, rating=5)
+    assert client.get(url).data["average_rating"] == 5
+
+    client.post(reverse("book-borrow-book"), {
+        "book_id": book.book_id,
+        "member_id": MemberFactory().member_id,
+        "borrow_date": "2025-08-10",
+        "due_date": "2025-08-24",
+    })
+    assert client.get(url).data["available_copies"] == 1
+
+    author = book.authors.get()
+    author.first_name = "Renamed"
+    author.save()
+    assert client.get(url).data["authors_detail"][0]["first_name"] == "Renamed"
+    assert cache_stats()["book"]["hits"] == 0
+
+
+def test_book_retrieve_answers_304_for_current_etag(client, book):
+    url = reverse("book-detail", args=[book.book_id])
+    response = client.get(url)
+    assert response["ETag"].startswith('W/"')
+    assert "Last-Modified" in response
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code == 304
+
+    author = book.authors.get()
+    author.first_name = "Renamed"
+    author.save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 200
+
+
+def test_member_list_etag_follows_filtered_rows(client):
+    MemberFactory.create_batch(2)
+    url = reverse("member-list")
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(url, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    MemberFactory()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_list_304_skips_serialization(client, django_assert_num_queries):
+    BorrowingFactory.create_batch(3)
+    url = reverse("borrowing-list")
+    etag = client.get(url)["ETag"]
+    with django_assert_num_queries(1):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+
 def test_book_availability_action(client):
     book = BookFactory(available_copies=3, total_copies=5)
     url = reverse("book-availability", args=[book.book_id])
@@ -60,6 +464,40 @@ def test_book_availability_action(client):
     assert response.data["total_copies"] == 5
 
 
+def test_batch_availability_serves_many_books_from_cache(client, django_assert_num_queries):
+    first, second = BookFactory(total_copies=4, available_copies=2), BookFactory(total_copies=1)
+    url = reverse("book-availability-batch")
+    ids = f"{second.book_id},{first.book_id},999999,{first.book_id}"
+    with django_assert_num_queries(1):
+        response = client.get(url, {"ids": ids})
+    assert response.status_code == 200
+    assert response.data == {
+        "results": [
+            {"book_id": second.book_id, "available_copies": 1, "total_copies": 1},
+            {"book_id": first.book_id, "available_copies": 2, "total_copies": 4},
+        ],
+        "not_found": [999999],
+    }
+    with django_assert_num_queries(1):
+        client.get(url, {"ids": ids})  # only the unknown id is looked up again
+
+    client.post(reverse("book-borrow-book"), {
+        "book_id": first.book_id,
+        "member_id": MemberFactory().member_id,
+        "borrow_date": "2025-08-10",
+        "due_date": "2025-08-24",
+    })
+    response = client.get(url, {"ids": first.book_id})
+    assert response.data["results"][0]["available_copies"] == 1
+
+
+def test_batch_availability_rejects_bad_ids(client):
+    url = reverse("book-availability-batch")
+    assert client.get(url, {"ids": "1,x"}).status_code == 400
+    assert client.get(url).status_code == 400
+    assert client.get(url, {"ids": ",".join(map(str, range(1, 502)))}).status_code == 400
+
+
 def test_borrow_book(client):
     book = BookFactory(available_copies=1)
     member = MemberFactory()
@@ -74,6 +512,35 @@ def test_borrow_book(client):
     assert response.data["status"] == "Book borrowed successfully."
 
 
+def test_borrow_book_without_copies_leaves_counter(client):
+    book = BookFactory(total_copies=1, available_copies=0)
+    url = reverse("book-borrow-book")
+    response = client.post(url, {
+        "book_id": book.book_id,
+        "member_id": MemberFactory().member_id,
+        "borrow_date": "2025-08-10",
+        "due_date": "2025-08-24"
+    })
+    assert response.status_code == 400
+    assert response.data["error"] == "No copies available."
+    book.refresh_from_db()
+    assert book.available_copies == 0
+
+
+def test_failed_borrow_rolls_back_claimed_copy(client):
+    borrowing = BorrowingFactory(book=BookFactory(total_copies=2))
+    url = reverse("book-borrow-book")
+    response = client.post(url, {
+        "book_id": borrowing.book_id,
+        "member_id": borrowing.member_id,
+        "borrow_date": "2025-08-10",
+        "due_date": "2025-08-24"
+    })
+    assert response.status_code == 400
+    borrowing.book.refresh_from_db()
+    assert borrowing.book.available_copies == 2
+
+
 def test_return_book(client):
     borrowing = BorrowingFactory(return_date=None)
     url = reverse("book-return-book")
@@ -83,6 +550,145 @@ def test_return_book(client):
     assert response.data["status"] == "Book returned."
 
 
+def test_return_book_puts_copy_back_once(client):
+    borrowing = BorrowingFactory(
+        book=BookFactory(total_copies=2, available_copies=1),
+        borrow_date=date(2020, 1, 1),
+        due_date=date(2020, 1, 15),
+    )
+    url = reverse("book-return-book")
+    response = client.post(url, {"borrowing_id": borrowing.borrowing_id})
+    assert response.status_code == 200
+    assert response.data["late_fee"] > 0
+    assert client.post(url, {"borrowing_id": borrowing.borrowing_id}).status_code == 400
+    borrowing.book.refresh_from_db()
+    assert borrowing.book.available_copies == 2
+
+
+def test_borrow_batch_best_effort_applies_valid_items(client, django_assert_max_num_queries):
+    books = BookFactory.create_batch(3, total_copies=1)
+    member = MemberFactory()
+    item = {"member_id": member.member_id, "borrow_date": "2025-08-10", "due_date": "2025-08-24"}
+    payload = {
+        "atomic": False,
+        "items": [
+            {**item, "book_id": books[0].book_id},
+            {**item, "book_id": books[1].book_id},
+            {**item, "book_id": books[0].book_id},
+            {**item, "book_id": 999999},
+        ],
+    }
+    with django_assert_max_num_queries(10):
+        response = client.post(reverse("book-borrow-batch"), payload, content_type="application/json")
+    assert response.status_code == 200
+    assert [r["status"] for r in response.data["results"]] == ["ok", "ok", "error", "error"]
+    assert response.data["results"][0]["borrowing_id"] is not None
+    assert [b.available_copies for b in Book.objects.filter(pk__in=[b.pk for b in books]).order_by("pk")] == [0, 0, 1]
+
+
+def test_borrow_batch_atomic_rolls_back_everything(client):
+    book = BookFactory(total_copies=1)
+    members = MemberFactory.create_batch(2)
+    payload = {"items": [
+        {"book_id": book.book_id, "member_id": m.member_id, "borrow_date": "2025-08-10", "due_date": "2025-08-24"}
+        for m in members
+    ]}
+    response = client.post(reverse("book-borrow-batch"), payload, content_type="application/json")
+    assert response.status_code == 400
+    assert [r["status"] for r in response.data["results"]] == ["not_applied", "error"]
+    assert not Borrowing.objects.exists()
+    book.refresh_from_db()
+    assert book.available_copies == 1
+
+
+def test_return_batch_restocks_and_charges_fees(client):
+    book = BookFactory(total_copies=3, available_copies=1)
+    borrowings = BorrowingFactory.create_batch(
+        2, book=book, borrow_date=date(2020, 1, 1), due_date=date(2020, 1, 15)
+    )
+    payload = {"items": [{"borrowing_id": b.borrowing_id} for b in borrowings]}
+    response = client.post(reverse("book-return-batch"), payload, content_type="application/json")
+    assert response.status_code == 200
+    assert response.data["succeeded"] == 2
+    assert all(r["late_fee"] > 0 for r in response.data["results"])
+    book.refresh_from_db()
+    assert book.available_copies == 3
+    assert not Borrowing.objects.filter(return_date__isnull=True).exists()
+
+    again = client.post(reverse("book-return-batch"), payload, content_type="application/json")
+    assert again.status_code == 400
+    assert again.data["failed"] == 2
+
+
+def test_import_books_csv(client, library, book):
+    author = book.authors.get()
+    csv_body = (
+        "title,isbn,publication_date,total_copies,available_copies,library,authors,categories\n"
+        f"Dune,ISBN-1,1965-08-01,3,2,{library.pk},{author.first_name} {author.last_name};frank herbert,Sci-Fi\n"
+        f"Dune Again,ISBN-1,,1,,{library.pk},,\n"
+        f"Old Copy,{book.isbn},,1,,{library.pk},,\n"
+        f"Too Many,ISBN-2,,1,5,{library.pk},,\n"
+    )
+    upload = SimpleUploadedFile("catalog.csv", csv_body.encode(), content_type="text/csv")
+    response = client.post(reverse("book-import-books"), {"file": upload})
+    assert response.status_code == 200
+    assert response.data["created"] == 1
+    assert response.data["duplicates"] == 2
+    assert response.data["invalid"] == 1
+
+    dune = Book.objects.get(isbn="ISBN-1")
+    assert dune.available_copies == 2
+    assert sorted(str(a) for a in dune.authors.all()) == sorted([str(author), "Frank Herbert"])
+    assert [c.category for c in dune.categories.all()] == ["Sci-Fi"]
+
+
+def test_import_books_ndjson_reuses_authors(client, library):
+    lines = [
+        {"title": f"Book {n}", "isbn": f"N-{n}", "library": library.pk, "authors": ["Ursula Le Guin"]}
+        for n in range(5)
+    ]
+    body = "\n".join(json.dumps(line) for line in lines).encode()
+    upload = SimpleUploadedFile("catalog.ndjson", body)
+    response = client.post(reverse("book-import-books"), {"file": upload, "chunk_size": 2})
+    assert response.status_code == 200
+    assert response.data["created"] == 5
+    assert Author.objects.filter(first_name="Ursula Le", last_name="Guin").count() == 1
+    assert Book.objects.filter(authors__last_name="Guin").count() == 5
+
+
+def test_import_books_counts_isbns_taken_by_a_concurrent_import(client, library, monkeypatch):
+    from libraries_database import importers
+
+    BookFactory(isbn="R-1", library=library)
+    lookups = []
+    existing_isbns = importers._existing_isbns
+
+    def racing_lookup(isbns):
+        # The first lookup runs before a concurrent import commits R-1.
+        lookups.append(isbns)
+        return existing_isbns(isbns) - {"R-1"} if len(lookups) == 1 else existing_isbns(isbns)
+
+    monkeypatch.setattr(importers, "_existing_isbns", racing_lookup)
+    body = "\n".join(
+        json.dumps({"title": f"Race {n}", "isbn": f"R-{n}", "library": library.pk}) for n in (1, 2)
+    ).encode()
+    response = client.post(reverse("book-import-books"), {"file": SimpleUploadedFile("catalog.ndjson", body)})
+    assert response.status_code == 200
+    assert (response.data["created"], response.data["duplicates"], response.data["invalid"]) == (1, 1, 0)
+    assert len(lookups) == 2
+    assert Book.objects.get(isbn="R-2").title == "Race 2"
+
+
+def test_import_books_ndjson_keeps_zero_available_copies(client, library):
+    body = json.dumps(
+        {"title": "Out", "isbn": "Z-1", "library": library.pk, "total_copies": 3, "available_copies": 0}
+    ).encode()
+    response = client.post(reverse("book-import-books"), {"file": SimpleUploadedFile("catalog.ndjson", body)})
+    assert response.data["created"] == 1
+    book = Book.objects.get(isbn="Z-1")
+    assert (book.total_copies, book.available_copies) == (3, 0)
+
+
 # ------------------------------
 # Author Tests
 # ------------------------------
@@ -116,6 +722,146 @@ def test_list_members(client):
     assert len(response.data) == 4
 
 
+def test_member_list_overdue_flag_is_annotated(assert_constant_list_queries):
+    def make_rows(n):
+        for member in MemberFactory.create_batch(n):
+            BorrowingFactory(member=member, borrow_date=date(2020, 1, 1), due_date=date(2020, 1, 15))
+
+    assert_constant_list_queries(reverse("member-list"), make_rows)
+
+
+def test_member_has_overdue_filter(client):
+    overdue = BorrowingFactory(borrow_date=date(2020, 1, 1), due_date=date(2020, 1, 15)).member
+    BorrowingFactory(borrow_date=date(2020, 1, 1), due_date=date(2020, 1, 15), return_date=date(2020, 1, 10))
+    MemberFactory()
+    url = reverse("member-list")
+
+    response = client.get(url, {"has_overdue": "true"})
+    assert response.status_code == 200
+    assert [row["member_id"] for row in response.data["results"]] == [overdue.member_id]
+    assert response.data["results"][0]["has_overdue"] is True
+
+    response = client.get(url, {"has_overdue": "false"})
+    assert len(response.data["results"]) == 2
+    assert not any(row["has_overdue"] for row in response.data["results"])
+
+
+# ------------------------------
+# Keyset Pagination
+# ------------------------------
+def _walk_cursor(client, url, params):
+    pages, response = [], client.get(url, {**params, "cursor": ""})
+    while len(pages) < 50:
+        assert response.status_code == 200
+        assert "count" not in response.data
+        pages.append([row["borrowing_id"] for row in response.data["results"]])
+        if not response.data["next"]:
+            return pages, response
+        response = client.get(response.data["next"])
+    pytest.fail("Following next never reached the last page.")
+
+
+def test_borrowings_keyset_pagination_follows_ordering(client):
+    book = BookFactory()
+    borrowings = [
+        BorrowingFactory(book=book, borrow_date=date(2024, 1, 1), due_date=date(2024, 1, day % 3 + 10))
+        for day in range(7)
+    ]
+    expected = [
+        b.borrowing_id for b in sorted(borrowings, key=lambda b: (b.due_date, b.borrowing_id), reverse=True)
+    ]
+    url = reverse("borrowing-list")
+
+    pages, last = _walk_cursor(client, url, {"ordering": "-due_date", "page_size": 3})
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == expected
+
+    previous = client.get(last.data["previous"])
+    assert [row["borrowing_id"] for row in previous.data["results"]] == pages[1]
+
+
+def test_keyset_cursor_keeps_sub_millisecond_timestamps(client):
+    borrowings = BorrowingFactory.create_batch(6)
+    base = datetime(2024, 1, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    for i, borrowing in enumerate(borrowings):
+        # Same millisecond, reversed microsecond order so pk order doesn't help.
+        Borrowing.objects.filter(pk=borrowing.pk).update(updated_at=base + timedelta(microseconds=5 - i))
+    expected = [borrowing.borrowing_id for borrowing in reversed(borrowings)]
+    url = reverse("borrowing-list")
+
+    pages, _ = _walk_cursor(client, url, {"ordering": "updated_at", "page_size": 2})
+    assert sum(pages, []) == expected
+    pages, _ = _walk_cursor(client, url, {"ordering": "-updated_at", "page_size": 2})
+    assert sum(pages, []) == expected[::-1]
+
+
+def test_keyset_page_etag_skips_count(client, django_assert_num_queries):
+    first, second = BorrowingFactory.create_batch(2)
+    url = reverse("borrowing-list")
+    params = {"cursor": "", "page_size": 1}
+    etag = client.get(url, params)["ETag"]
+    with django_assert_num_queries(1) as context:
+        assert client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert "COUNT(" not in context.captured_queries[0]["sql"].upper()
+
+    second.return_date = second.borrow_date
+    second.save()
+    assert client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    first.return_date = first.borrow_date
+    first.save()
+    assert client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_keyset_cursor_rejected_after_ordering_change(client):
+    BorrowingFactory.create_batch(3)
+    url = reverse("borrowing-list")
+    first = client.get(url, {"cursor": "", "page_size": 1, "ordering": "due_date"})
+    next_url = first.data["next"].replace("ordering=due_date", "ordering=-borrow_date")
+    assert client.get(next_url).status_code == 404
+
+
+# ------------------------------
+# Streaming Exports
+# ------------------------------
+def test_borrowings_export_ndjson_honours_filters(client):
+    returned = BorrowingFactory(borrow_date=date(2020, 1, 1), due_date=date(2020, 1, 15), return_date=date(2020, 1, 5))
+    BorrowingFactory()
+    response = client.get(reverse("borrowing-export"), {"return_date_isnull": "false", "format": "ndjson"})
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+    assert [row["borrowing_id"] for row in rows] == [returned.borrowing_id]
+    assert rows[0]["member"] == returned.member_id
+    assert rows[0]["return_date"] == "2020-01-05"
+
+
+def test_reviews_export_csv(client):
+    reviews = ReviewFactory.create_batch(3)
+    response = client.get(reverse("review-export"), {"format": "csv"})
+    assert response.status_code == 200
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines[0].startswith("review_id,member,book,rating")
+    assert len(lines) == 1 + len(reviews)
+
+
+def test_export_queries_count_towards_the_route_once_streamed(client):
+    BorrowingFactory.create_batch(3)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("borrowing-export"), {"format": "csv"})
+        assert "borrowing-export" not in route_histograms()
+        b"".join(response.streaming_content)
+    histogram = route_histograms()["borrowing-export"]
+    assert histogram["count"] == 1
+    assert histogram["queries"] == len(ctx.captured_queries) > 0
+
+
+def test_export_errors_are_json(client):
+    response = client.get(reverse("borrowing-export"), {"member": "x", "format": "csv"})
+    assert response.status_code == 400
+    assert response["Content-Type"] == "application/json"
+    assert "member" in response.json()["errors"]
+
+
 # ------------------------------
 # Active Borrowings
 # ------------------------------
@@ -128,6 +874,98 @@ def test_member_active_borrowings_action(client):
     assert len(response.data) == 2
 
 
+# ------------------------------
+# Statistics
+# ------------------------------
+def test_statistics_follow_writes_without_counting(client, django_assert_num_queries):
+    book = BookFactory(total_copies=2)
+    member = MemberFactory()
+    url = reverse("library-statistics")
+    assert client.get(url).data == {
+        "total_books": 1, "total_members": 1, "total_borrowings": 0, "active_borrowings": 0,
+    }
+
+    client.post(reverse("book-borrow-book"), {
+        "book_id": book.book_id, "member_id": member.member_id,
+        "borrow_date": "2025-08-10", "due_date": "2025-08-24",
+    })
+    BookFactory(library=book.library)
+    with django_assert_num_queries(1):
+        stats = client.get(url, {"by_library": "true"}).data
+    assert stats["total_books"] == 2
+    assert (stats["total_borrowings"], stats["active_borrowings"]) == (1, 1)
+    library_stats = next(row for row in stats["libraries"] if row["library_id"] == book.library_id)
+    assert library_stats == {
+        "library_id": book.library_id, "total_books": 2, "total_borrowings": 1, "active_borrowings": 1,
+    }
+
+    borrowing = Borrowing.objects.get()
+    client.post(reverse("book-return-book"), {"borrowing_id": borrowing.borrowing_id})
+    member.delete()
+    stats = client.get(url).data
+    assert stats == {"total_books": 2, "total_members": 0, "total_borrowings": 0, "active_borrowings": 0}
+
+
+def test_statistics_follow_a_book_moved_to_another_library(client):
+    from libraries_database import counters
+
+    book = BookFactory(total_copies=2)
+    BorrowingFactory(book=book, return_date=None)
+    BorrowingFactory(
+        book=book, borrow_date=date(2025, 8, 1), due_date=date(2025, 8, 15), return_date=date(2025, 8, 20)
+    )
+    other = LibraryFactory()
+    client.get(reverse("library-statistics"))  # initialises the counters
+
+    response = client.patch(
+        reverse("book-detail", args=[book.book_id]), {"library": other.pk}, content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert counters.reconcile() == {}
+    stats = client.get(reverse("library-statistics"), {"by_library": "true"}).data
+    libraries = {row["library_id"]: row for row in stats["libraries"]}
+    assert libraries[other.pk] == {
+        "library_id": other.pk, "total_books": 1, "total_borrowings": 2, "active_borrowings": 1,
+    }
+    assert libraries[book.library_id]["total_books"] == 0
+
+
+def test_statistics_count_a_library_delete_out_in_grouped_queries(client):
+    from libraries_database import counters
+
+    library = LibraryFactory()
+    for book in BookFactory.create_batch(3, library=library, total_copies=3):
+        BorrowingFactory(book=book, return_date=None)
+        BorrowingFactory(
+            book=book, borrow_date=date(2025, 8, 1), due_date=date(2025, 8, 15), return_date=date(2025, 8, 20)
+        )
+    kept = BorrowingFactory(return_date=None)
+    client.get(reverse("library-statistics"))  # initialises the counters
+
+    with CaptureQueriesContext(connection) as ctx:
+        library.delete()
+    counter_writes = [
+        query["sql"] for query in ctx.captured_queries
+        if "statisticcounter" in query["sql"] and not query["sql"].startswith("SELECT")
+    ]
+    # One UPDATE for the whole cascade, one DELETE for the library's rows.
+    assert len(counter_writes) == 2
+    assert counters.reconcile() == {}
+    stats = client.get(reverse("library-statistics")).data
+    assert stats == {"total_books": 1, "total_members": 7, "total_borrowings": 1, "active_borrowings": 1}
+
+    kept.member.delete()
+    assert counters.reconcile() == {}
+
+
+def test_reconcile_counters_fixes_drift(client):
+    BookFactory.create_batch(2)
+    client.get(reverse("library-statistics"))
+    StatisticCounter.objects.filter(key="books").update(value=40)
+    call_command("reconcile_counters", stdout=StringIO())
+    assert client.get(reverse("library-statistics")).data["total_books"] == 2
+
+
 # ------------------------------
 # Borrowing History
 # ------------------------------
@@ -138,3 +976,67 @@ def test_member_borrowing_history_view(client):
     response = client.get(url)
     assert response.status_code == 200
     assert len(response.data) == 3
+
+
+# ------------------------------
+# Request Metrics Tests
+# ------------------------------
+def test_request_metrics_server_timing_and_histograms(client, caplog):
+    BookFactory.create_batch(2)
+    with caplog.at_level("INFO", logger="library_management_system.requests"):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse("book-list"))
+    queries = len(ctx.captured_queries)
+    assert response.status_code == 200
+    timing = response["Server-Timing"]
+    assert f'desc="{queries} queries"' in timing
+    assert "serializer;dur=" in timing and "total;dur=" in timing
+
+    client.get(reverse("library-statistics"))
+    histograms = route_histograms()
+    assert histograms["book-list"]["count"] == 1
+    assert histograms["book-list"]["queries"] == queries
+    assert sum(histograms["book-list"]["buckets"]) == 1
+    assert histograms["library-statistics"]["count"] == 1
+
+    logged = json.loads(caplog.records[0].getMessage())
+    assert logged["route"] == "book-list"
+    assert logged["queries"] == queries
+
+
+def test_metrics_endpoint_exposes_prometheus_text_without_counting(client):
+    BookFactory.create_batch(2)
+    client.get(reverse("book-list"))
+    client.get(reverse("book-list"))
+    client.get(reverse("library-statistics"))  # initialises the counters
+    call_command("accrue_late_fees", stdout=StringIO())
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("metrics"))
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert not any("COUNT(" in query["sql"].upper() for query in ctx.captured_queries)
+
+    text = response.content.decode()
+    assert 'library_http_requests_total{route="book-list"} 2' in text
+    assert 'library_http_request_duration_seconds_bucket{route="book-list",le="+Inf"} 2' in text
+    assert 'library_response_cache_requests_total{viewset="book",result="hit"} 1' in text
+    assert "library_books 2" in text
+    assert "library_overdue_borrowings 0" in text
+
+
+def test_metrics_sum_flushed_worker_files(client, settings, tmp_path):
+    from libraries_database import metrics
+
+    settings.METRICS_DIR = str(tmp_path)
+    client.get(reverse("library-statistics"))
+    metrics.flush(force=True)
+    other = metrics.process_snapshot()
+    other["pid"] = 999999
+    other["connections_opened"] = 7
+    (tmp_path / "999999.json").write_text(json.dumps(other))
+
+    text = client.get(reverse("metrics")).content.decode()
+    assert "library_metrics_processes 2" in text
+    assert 'library_http_requests_total{route="library-statistics"} 2' in text
+    assert "library_db_connections_opened_total 7" in text
@@ -19,6 +19,8 @@ urlpatterns = [
     path('', include(router.urls)),
     path('statistics/', StatisticsView.as_view(), name='library-statistics'),
     path('statistics/', StatisticsView.as_view(), name='statistics-view'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
 
     path(
         'member/<int:member_id>/borrowings/',
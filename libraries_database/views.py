@@ -1,21 +1,31 @@
 # Create your views here.
+from django.db import IntegrityError
+from django.db.models import Prefetch
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
 
+from . import autocomplete, availability as availability_cache, circulation, counters, facets, importers, metrics
+from .caching import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .exports import StreamingExportMixin
+from .pagination import PageNumberOrKeysetPagination
 from .filters import *
 from .serializers import *
 from .models import *
 
 # drf-spectacular imports
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     extend_schema, extend_schema_view,
-    OpenApiExample
+    OpenApiExample, OpenApiParameter
 )
 
 
@@ -37,7 +47,7 @@ from drf_spectacular.utils import (
     partial_update=extend_schema(description="Partially update an existing library."),
     destroy=extend_schema(description="Delete a library."),
 )
-class LibraryViewSet(viewsets.ModelViewSet):
+class LibraryViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Library.objects.all()
     queryset = Library.objects.all()
     serializer_class = LibrarySerializer
@@ -75,14 +85,35 @@ class LibraryViewSet(viewsets.ModelViewSet):
     partial_update=extend_schema(description="Partially update a book."),
     destroy=extend_schema(description="Delete a book."),
 )
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    # Reviews feed average_rating; the through tables feed the nested lists.
+    cache_dependencies = (Book, Author, Category, BookAuthor, BookCategory, Review)
+    # Review writes already touch Book.updated_at.
+    etag_dependencies = (Author, Category, BookAuthor, BookCategory)
+    # ?search= goes through the search index (search.py), ranked by relevance.
+    filter_backends = [DjangoFilterBackend, OrderingFilter, IndexedSearchFilter]
     filterset_class = BookFilter
     ordering_fields = '__all__'
     ordering = ['book_id']
-    search_fields = ['title', 'authors__first_name', 'authors__last_name', 'categories__category']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Load the nested author/category columns in one query each so a
+            # page of books costs a fixed number of queries.
+            queryset = queryset.select_related('library').prefetch_related(
+                Prefetch(
+                    'authors',
+                    queryset=Author.objects.only(*AuthorNestedSerializer.Meta.fields),
+                ),
+                Prefetch(
+                    'categories',
+                    queryset=Category.objects.only(*CategoryNestedSerializer.Meta.fields),
+                ),
+            )
+        return queryset
 
     @extend_schema(
         description="Check availability of a book (available vs total copies).",
@@ -101,6 +132,84 @@ class BookViewSet(viewsets.ModelViewSet):
             'total_copies': book.total_copies
         })
 
+    @extend_schema(
+        description=(
+            "Availability of many books in one request. Unknown ids are listed "
+            "under not_found. Counts may lag a write on another worker by a few seconds."
+        ),
+        parameters=[OpenApiParameter(
+            'ids', OpenApiTypes.STR, required=True,
+            description=f"Comma-separated book IDs, at most {availability_cache.MAX_IDS}.",
+        )],
+        responses={200: OpenApiExample(
+            "Batch availability response",
+            value={
+                "results": [{"book_id": 1, "available_copies": 3, "total_copies": 5}],
+                "not_found": [42],
+            },
+            response_only=True,
+        )}
+    )
+    @action(detail=False, methods=['get'], url_path='availability', url_name='availability-batch')
+    def availability_batch(self, request):
+        try:
+            book_ids = list(dict.fromkeys(
+                int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()
+            ))
+        except ValueError:
+            return Response({'error': "'ids' must be a comma-separated list of integers."}, status=400)
+        if not book_ids:
+            return Response({'error': "'ids' is required."}, status=400)
+        if len(book_ids) > availability_cache.MAX_IDS:
+            return Response({'error': f"At most {availability_cache.MAX_IDS} ids per request."}, status=400)
+
+        counts = availability_cache.get_many(book_ids)
+        return Response({
+            'results': [
+                {'book_id': book_id, 'available_copies': counts[book_id][0], 'total_copies': counts[book_id][1]}
+                for book_id in book_ids if book_id in counts
+            ],
+            'not_found': [book_id for book_id in book_ids if book_id not in counts],
+        })
+
+    @extend_schema(
+        description=(
+            "Counts of the books matching the /books/ filters (and ?search=) per category, "
+            "library, availability and publication decade, in three grouped queries. "
+            "Cached by the normalized filter."
+        ),
+        responses={200: OpenApiExample(
+            "Facets response",
+            value={
+                "count": 120,
+                "categories": [{"id": 3, "name": "Fiction", "count": 64}],
+                "libraries": [{"id": 1, "name": "Main Library", "count": 120}],
+                "availability": {"available": 97, "unavailable": 23},
+                "decades": [{"decade": 1990, "count": 40}, {"decade": None, "count": 2}],
+            },
+            response_only=True,
+        )}
+    )
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        return self._cached(self._facets, request)
+
+    def _facets(self, request):
+        return Response(facets.count_facets(self.filter_queryset(self.get_queryset())))
+
+    def get_cache_dependencies(self):
+        if self.action == 'facets':
+            # Facets name libraries; the list and detail output does not.
+            return (*self.cache_dependencies, Library)
+        return super().get_cache_dependencies()
+
+    def get_cache_query(self, request):
+        if self.action == 'facets':
+            key = facets.filter_key(self.filterset_class(request.query_params, request=request), request)
+            if key is not None:
+                return key
+        return super().get_cache_query(request)
+
     @extend_schema(
         description="Borrow a book for a member.",
         examples=[
@@ -124,22 +233,8 @@ class BookViewSet(viewsets.ModelViewSet):
             borrow_date = request.data.get('borrow_date')
             due_date = request.data.get('due_date')
 
-            book = Book.objects.get(pk=book_id)
             member = Member.objects.get(pk=member_id)
-
-            if book.available_copies < 1:
-                return Response({'error': 'No copies available.'}, status=400)
-
-            Borrowing.objects.create(
-                member=member,
-                book=book,
-                borrow_date=borrow_date,
-                due_date=due_date,
-                late_fee=0
-            )
-
-            book.available_copies -= 1
-            book.save()
+            circulation.borrow(book_id, member, borrow_date, due_date)
             return Response({'status': 'Book borrowed successfully.'}, status=200)
 
         except Exception as e:
@@ -169,23 +264,125 @@ class BookViewSet(viewsets.ModelViewSet):
             if borrowing.return_date:
                 return Response({'error': 'Book already returned.'}, status=400)
 
-            borrowing.return_date = timezone.now().date()
-            if borrowing.return_date > borrowing.due_date:
-                days_late = (borrowing.return_date - borrowing.due_date).days
-                borrowing.late_fee = days_late * 5
-            else:
-                borrowing.late_fee = 0
-            borrowing.save()
-
-            book = borrowing.book
-            book.available_copies += 1
-            book.save()
-
+            circulation.return_borrowing(borrowing)
             return Response({'status': 'Book returned.', 'late_fee': borrowing.late_fee}, status=200)
 
         except Exception as e:
             return Response({'error': str(e)}, status=400)
 
+    def _run_batch(self, request, handler):
+        items = request.data.get('items')
+        atomic = request.data.get('atomic', True)
+        if not isinstance(items, list) or not items:
+            return Response({'error': "'items' must be a non-empty list."}, status=400)
+        if len(items) > circulation.MAX_BATCH_SIZE:
+            return Response(
+                {'error': f"A batch may contain at most {circulation.MAX_BATCH_SIZE} items."}, status=400
+            )
+        if not isinstance(atomic, bool):
+            return Response({'error': "'atomic' must be true or false."}, status=400)
+
+        try:
+            result = handler(items, atomic=atomic)
+        except (circulation.CirculationError, IntegrityError) as e:
+            return Response({'error': str(e)}, status=409)
+        return Response(result, status=400 if atomic and result['failed'] else 200)
+
+    @extend_schema(
+        description=(
+            "Borrow several books in one request. With atomic=true (default) any failing item "
+            "aborts the whole batch; with atomic=false valid items are applied and failures reported."
+        ),
+        examples=[
+            OpenApiExample(
+                "Batch borrow request",
+                value={
+                    "atomic": False,
+                    "items": [
+                        {"book_id": 1, "member_id": 2, "borrow_date": "2025-08-10", "due_date": "2025-08-24"},
+                        {"book_id": 3, "member_id": 2, "borrow_date": "2025-08-10", "due_date": "2025-08-24"},
+                    ],
+                },
+                request_only=True,
+            ),
+            OpenApiExample(
+                "Batch borrow response",
+                value={
+                    "atomic": False, "succeeded": 1, "failed": 1,
+                    "results": [
+                        {"index": 0, "status": "ok", "member_id": 2, "book_id": 1, "borrowing_id": 41},
+                        {"index": 1, "status": "error", "error": "No copies available."},
+                    ],
+                },
+                response_only=True,
+            ),
+        ]
+    )
+    @action(detail=False, methods=['post'], url_path='borrow/batch')
+    def borrow_batch(self, request):
+        return self._run_batch(request, circulation.borrow_batch)
+
+    @extend_schema(
+        description="Return several borrowings in one request, with the same atomic semantics as batch borrow.",
+        examples=[
+            OpenApiExample(
+                "Batch return request",
+                value={"atomic": True, "items": [{"borrowing_id": 10}, {"borrowing_id": 11}]},
+                request_only=True,
+            ),
+            OpenApiExample(
+                "Batch return response",
+                value={
+                    "atomic": True, "succeeded": 2, "failed": 0,
+                    "results": [
+                        {"index": 0, "status": "ok", "borrowing_id": 10, "late_fee": 0},
+                        {"index": 1, "status": "ok", "borrowing_id": 11, "late_fee": 15},
+                    ],
+                },
+                response_only=True,
+            ),
+        ]
+    )
+    @action(detail=False, methods=['post'], url_path='return/batch')
+    def return_batch(self, request):
+        return self._run_batch(request, circulation.return_batch)
+
+    @extend_schema(
+        description=(
+            "Bulk-import books from an uploaded CSV or NDJSON file ('file' form field). "
+            "The format comes from the 'format' field or the file extension. Rows whose ISBN "
+            "already exists are skipped; authors and categories are matched by name or created."
+        ),
+        request={'multipart/form-data': {
+            'type': 'object',
+            'properties': {
+                'file': {'type': 'string', 'format': 'binary'},
+                'format': {'type': 'string', 'enum': list(importers.FORMATS)},
+                'chunk_size': {'type': 'integer'},
+            },
+        }},
+        examples=[OpenApiExample(
+            "Import report",
+            value={"rows": 1000, "created": 990, "duplicates": 8, "invalid": 2,
+                   "errors": [{"row": 17, "error": "Library 9 does not exist."}],
+                   "seconds": 0.41, "rows_per_sec": 2439.0},
+            response_only=True,
+        )]
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_books(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': "Upload the catalog as the 'file' field."}, status=400)
+        fmt = request.data.get('format') or importers.detect_format(upload.name)
+        try:
+            chunk_size = int(request.data.get('chunk_size') or 1000)
+            rows = importers.read_rows(upload.file, fmt)
+            report = importers.import_books(rows, chunk_size=max(1, min(chunk_size, 10000)))
+        except (importers.ImportFormatError, ValueError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(report.as_dict(), status=200)
+
     @extend_schema(
         description="Get all active borrowings for a member.",
         responses={200: BorrowingSerializer(many=True)}
@@ -207,10 +404,10 @@ class BookViewSet(viewsets.ModelViewSet):
     retrieve=extend_schema(description="Get details of an author."),
     create=extend_schema(description="Create a new author."),
 )
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FuzzyNameFilter]
     filterset_class = AuthorFilter
     ordering_fields = '__all__'
     ordering = ['author_id']
@@ -224,7 +421,7 @@ class AuthorViewSet(viewsets.ModelViewSet):
     retrieve=extend_schema(description="Get details of a category."),
     create=extend_schema(description="Create a new category."),
 )
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -267,13 +464,21 @@ class CategoryViewSet(viewsets.ModelViewSet):
 #         serializer = BorrowingSerializer(borrowings, many=True)
 #         return Response(serializer.data)
 
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FuzzyNameFilter]
     filterset_class = MemberFilter
     ordering_fields = '__all__'
     ordering = ['member_id']
+    # has_overdue follows the member's borrowings and flips as due dates pass.
+    etag_dependencies = (Borrowing,)
+
+    def get_queryset(self):
+        return super().get_queryset().with_has_overdue()
+
+    def get_etag_extra(self):
+        return (timezone.localdate().isoformat(),)
 
     @extend_schema(
         description="Get borrowing history of a member.",
@@ -306,11 +511,12 @@ class MemberViewSet(viewsets.ModelViewSet):
     retrieve=extend_schema(description="Get details of a borrowing."),
     create=extend_schema(description="Create a new borrowing record."),
 )
-class BorrowingViewSet(viewsets.ModelViewSet):
+class BorrowingViewSet(ConditionalGetMixin, StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Borrowing.objects.all()
     serializer_class = BorrowingSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = BorrowingFilter
+    pagination_class = PageNumberOrKeysetPagination
     ordering_fields = '__all__'
     ordering = ['borrowing_id']
 
@@ -323,11 +529,12 @@ class BorrowingViewSet(viewsets.ModelViewSet):
     retrieve=extend_schema(description="Get details of a review."),
     create=extend_schema(description="Submit a new review."),
 )
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ReviewFilter
+    pagination_class = PageNumberOrKeysetPagination
     ordering_fields = '__all__'
     ordering = ['review_id']
 
@@ -335,7 +542,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
 # -------------------------
 # BOOKAUTHOR VIEWSET
 # -------------------------
-class BookAuthorViewSet(viewsets.ModelViewSet):
+class BookAuthorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = BookAuthor.objects.all()
     serializer_class = BookAuthorSerializer
 
@@ -343,7 +550,7 @@ class BookAuthorViewSet(viewsets.ModelViewSet):
 # -------------------------
 # BOOKCATEGORY VIEWSET
 # -------------------------
-class BookCategoryViewSet(viewsets.ModelViewSet):
+class BookCategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = BookCategory.objects.all()
     serializer_class = BookCategorySerializer
 
@@ -352,7 +559,11 @@ class BookCategoryViewSet(viewsets.ModelViewSet):
 # STATISTICS API
 # -------------------------
 @extend_schema(
-    description="Get overall statistics about the library (books, members, borrowings).",
+    description=(
+        "Get overall statistics about the library (books, members, borrowings). "
+        "Served from maintained counters; pass ?by_library=true for a per-library breakdown."
+    ),
+    parameters=[OpenApiParameter('by_library', OpenApiTypes.BOOL)],
     responses={200: OpenApiExample(
         "Statistics response",
         value={"total_books": 120, "total_members": 45, "total_borrowings": 320, "active_borrowings": 12},
@@ -361,16 +572,58 @@ class BookCategoryViewSet(viewsets.ModelViewSet):
 )
 class StatisticsView(APIView):
     def get(self, request):
-        total_books = Book.objects.count()
-        total_members = Member.objects.count()
-        total_borrowings = Borrowing.objects.count()
-        active_borrowings = Borrowing.objects.filter(return_date__isnull=True).count()
-        return Response({
-            'total_books': total_books,
-            'total_members': total_members,
-            'total_borrowings': total_borrowings,
-            'active_borrowings': active_borrowings
-        })
+        by_library = request.query_params.get('by_library', '').lower() in ('1', 'true', 'yes')
+        return Response(counters.snapshot(by_library=by_library))
+
+
+# -------------------------
+# METRICS API
+# -------------------------
+@extend_schema(
+    description=(
+        "Prometheus text-format metrics: per-route request counts and latency histograms, "
+        "SQL counts, DB connections, response cache hits and domain gauges, summed over all workers."
+    ),
+    responses={(200, 'text/plain'): OpenApiTypes.STR},
+)
+class MetricsView(APIView):
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# -------------------------
+# AUTOCOMPLETE API
+# -------------------------
+@extend_schema(
+    description=(
+        "Prefix suggestions for a search box, served from an in-process index. "
+        "Author and category names match on any word; titles match from the start. "
+        "Writes on another worker show up within AUTOCOMPLETE_MAX_AGE seconds."
+    ),
+    parameters=[
+        OpenApiParameter('q', OpenApiTypes.STR, description="Text typed so far."),
+        OpenApiParameter('kind', OpenApiTypes.STR, enum=list(autocomplete.KINDS), default='title'),
+        OpenApiParameter('limit', OpenApiTypes.INT, description=f"At most {autocomplete.MAX_LIMIT}; default 10."),
+    ],
+    responses={200: OpenApiExample(
+        "Autocomplete response",
+        value={"kind": "author", "results": [{"id": 7, "value": "Fyodor Dostoevsky"}]},
+        response_only=True,
+    )}
+)
+class AutocompleteView(APIView):
+    def get(self, request):
+        kind = request.query_params.get('kind', 'title')
+        if kind not in autocomplete.KINDS:
+            return Response({'error': f"'kind' must be one of: {', '.join(autocomplete.KINDS)}."}, status=400)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'error': "'limit' must be an integer."}, status=400)
+        if not 1 <= limit <= autocomplete.MAX_LIMIT:
+            return Response({'error': f"'limit' must be between 1 and {autocomplete.MAX_LIMIT}."}, status=400)
+        query = request.query_params.get('q', '')
+        return Response({'kind': kind, 'results': autocomplete.lookup(kind, query, limit) if query.strip() else []})
 
 
 # -------------------------
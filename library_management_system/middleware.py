@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from libraries_database import instrumentation, metrics
+
+logger = logging.getLogger('library_management_system.requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Record SQL count, DB time, serializer time and total time for every request.
+
+    The numbers go out as ``Server-Timing`` headers (unless
+    ``REQUEST_METRICS_SERVER_TIMING`` is off), as one JSON log line on the
+    ``library_management_system.requests`` logger, and into per-route
+    histograms keyed by the resolved URL name (``book-list``,
+    ``library-statistics``), which /api/v1/metrics/ exposes. Streaming
+    responses are recorded once their body has been consumed, and carry no
+    ``Server-Timing`` header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.recorder = instrumentation.QueryRecorder()
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True)
+        atexit.register(metrics.flush, force=True)
+
+    def __call__(self, request):
+        request_metrics, token = instrumentation.start_request()
+        try:
+            with self.recording():
+                response = self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+
+        if response.streaming:
+            # Exports query while the server iterates the body, after this
+            # returns; keep accounting until the stream is exhausted or closed.
+            response.streaming_content = self.stream(request, response, response.streaming_content, request_metrics)
+            return response
+        self.finish(request, response, request_metrics)
+        return response
+
+    @contextmanager
+    def recording(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.recorder))
+            yield
+
+    def stream(self, request, response, content, request_metrics):
+        token = instrumentation.resume_request(request_metrics)
+        try:
+            with self.recording():
+                yield from content
+        finally:
+            instrumentation.finish_request(token)
+            self.finish(request, response, request_metrics)
+
+    def finish(self, request, response, request_metrics):
+        total_ms = request_metrics.elapsed_ms()
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else '<unresolved>'
+        instrumentation.observe(route, total_ms, request_metrics)
+        metrics.flush()
+
+        serializer_ms = request_metrics.timers.get('serializer', 0.0)
+        # A streamed body finishes after its headers went out.
+        if self.server_timing and not response.streaming:
+            response['Server-Timing'] = (
+                f'db;dur={request_metrics.db_ms:.2f};desc="{request_metrics.queries} queries", '
+                f'serializer;dur={serializer_ms:.2f}, '
+                f'total;dur={total_ms:.2f}'
+            )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'route': route,
+                'method': request.method,
+                'status': response.status_code,
+                'queries': request_metrics.queries,
+                'db_ms': round(request_metrics.db_ms, 2),
+                'serializer_ms': round(serializer_ms, 2),
+                'total_ms': round(total_ms, 2),
+            }))
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'library_management_system.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,10 +92,59 @@ DATABASES = {
 }
 
 
+# Request metrics
+# Server-Timing exposes DB timings to clients; turn it off if that matters.
+
+REQUEST_METRICS_SERVER_TIMING = True
+
+# Worker processes share /api/v1/metrics/ numbers through per-pid files here.
+# Give every deployment its own directory and clear it on deploy.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'library-management-system-metrics'))
+METRICS_FLUSH_INTERVAL = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process. Point RESPONSE_CACHE_ALIAS at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) to share hits and
+# invalidations between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-management-system',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Per-process copy counts behind GET /books/availability/?ids=...
+AVAILABILITY_CACHE_SIZE = 10000
+AVAILABILITY_CACHE_TTL = 5
+
+# Per-process prefix indexes behind GET /api/v1/autocomplete/: objects kept per
+# kind, and seconds before an index is reloaded to pick up other workers' writes.
+AUTOCOMPLETE_MAX_ENTRIES = 1000000
+AUTOCOMPLETE_MAX_AGE = 600
+
+
+# Circulation
+# Daily late fee per Member.MemberType; unlisted types pay LATE_FEE_PER_DAY.
+
+LATE_FEE_RATES = {
+    'student': 5,
+    'faculty': 5,
+}
+
+
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'libraries_database.utils.exception_handler.custom_exception_handler',
     # other DRF settings if you have
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # The large collections (borrowings, reviews) also take ?cursor=; see
+    # libraries_database.pagination.PageNumberOrKeysetPagination.
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'PAGE_SIZE_QUERY_PARAM': 'page_size',
@@ -33,6 +33,9 @@ DATABASES = {
     }
 }
 
+# Keep request metrics in-process; tests that need the directory set their own.
+METRICS_DIR = None
+
 # Optional: faster password hashing for tests
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.MD5PasswordHasher",